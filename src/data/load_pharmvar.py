@@ -1,94 +1,263 @@
 import os
-import json
 import argparse
-import pandas as pd
-from typing import Dict, Any, Optional, List
+import logging
+import functools
+import collections
+import concurrent.futures
+from datetime import datetime, timezone
+import orjson
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv as pacsv
+from typing import Dict, Any, Optional, List, Tuple, Iterable, Iterator, Callable, BinaryIO
+
+logger = logging.getLogger(__name__)
+
+def _scan_tsv_header(tsv_path: str) -> Tuple[int, List[str]]:
+    """
+    Returns the number of leading '#' comment lines and the column names of a PharmVar TSV.
+    PyArrow's CSV reader has no equivalent of pandas' comment='#', so we skip these lines explicitly.
+    """
+    comment_lines = 0
+    with open(tsv_path, 'r') as f:
+        for line in f:
+            if line.startswith('#'):
+                comment_lines += 1
+                continue
+            return comment_lines, line.rstrip('\r\n').split('\t')
+    return comment_lines, []
+
+def _read_pharmvar_tsv(tsv_path: str) -> pa.Table:
+    """
+    Reads a PharmVar TSV into an Arrow table with PyArrow's multithreaded CSV reader.
+    All columns are kept as strings and empty cells arrive as '' rather than null
+    (like pd.read_csv(dtype=str, keep_default_na=False)), so callers need no null handling.
+    """
+    comment_lines, column_names = _scan_tsv_header(tsv_path)
+    return pacsv.read_csv(
+        tsv_path,
+        read_options=pacsv.ReadOptions(skip_rows=comment_lines),
+        parse_options=pacsv.ParseOptions(delimiter='\t'),
+        convert_options=pacsv.ConvertOptions(
+            column_types={col: pa.string() for col in column_names},
+            strings_can_be_null=False
+        )
+    )
+
+def _string_column(table: pa.Table, name: str) -> pa.ChunkedArray:
+    """Returns the whitespace-stripped string column `name`, or a column of '' if the TSV lacks it."""
+    if name not in table.column_names:
+        return pa.chunked_array([pa.array([''] * table.num_rows, pa.string())])
+    return pc.utf8_trim_whitespace(table[name])
+
+# Haplotype TSV columns and the keys they are stored under in 'variant_details'
+_VARIANT_COLUMNS = {
+    'rsID': 'rsID',
+    'ReferenceSequence': 'reference_sequence',
+    'Variant Start': 'variant_start',
+    'Variant Stop': 'variant_stop',
+    'Reference Allele': 'reference_allele',
+    'Variant Allele': 'variant_allele',
+    'Type': 'type',
+}
+# Low-cardinality 'variant_details' fields whose values are shared between records
+_POOLED_VARIANT_KEYS = ('rsID', 'reference_sequence', 'type')
 
 def load_and_process_gene_pharmvar(gene_name: str, tsv_path: str) -> Optional[Dict[str, Any]]:
     """
     Loads and processes a single PharmVar haplotype definitions TSV file for a given gene.
     Extracts allele information (name and defining variants).
+    The whole build runs as Arrow compute kernels; Python only touches the finished per-allele records.
     """
-    print(f"Processing PharmVar data for {gene_name} from {tsv_path}...")
-    
+    logger.info("Processing PharmVar data for %s from %s...", gene_name, tsv_path)
+
     try:
         # We expect the TSV to be tab-separated and comments starting with '#'
-        df = pd.read_csv(tsv_path, sep='\t', comment='#', dtype=str)
+        table = _read_pharmvar_tsv(tsv_path)
     except FileNotFoundError:
-        print(f"Error: PharmVar TSV file not found for {gene_name} at {tsv_path}. Skipping this gene.")
+        logger.error("PharmVar TSV file not found for %s at %s. Skipping this gene.", gene_name, tsv_path)
         return None
     except Exception as e:
-        print(f"Error reading TSV for {gene_name}: {e}. Skipping this gene.")
+        logger.error("Error reading TSV for %s: %s. Skipping this gene.", gene_name, e)
         return None
 
     gene_data = {"definitions": {}} # No phenotype_mapping here, will be external
 
-    # Create a mapping for primary alleles and their aliases/sub-alleles
-    for index, row in df.iterrows():
-        allele_name_raw = str(row.get('Haplotype Name')).strip() # Corrected column name
-        
-        if not allele_name_raw:
-            continue # Skip malformed rows
-
-        # Normalize the allele name to the standard * format
-        # Remove gene prefix if present (e.g., 'CYP2D6*1' -> '*1')
-        normalized_allele = allele_name_raw.replace(gene_name, '').replace('*', '').strip()
-        if not normalized_allele.startswith('*'):
-            normalized_allele = '*' + normalized_allele
-        
+    # Normalize all allele names to the standard * format
+    # Remove gene prefix if present (e.g., 'CYP2D6*1' -> '*1')
+    allele_names_raw = _string_column(table, 'Haplotype Name')
+    normalized_alleles = pc.binary_join_element_wise(
+        '*',
+        pc.utf8_trim_whitespace(pc.replace_substring(pc.replace_substring(allele_names_raw, gene_name, ''), '*', '')),
+        '' # Separator: plain concatenation
+    )
+
+    # Variant details as one struct column, keyed by the output field names
+    variant_columns = [_string_column(table, col) for col in _VARIANT_COLUMNS]
+    variants = pc.make_struct(*variant_columns, field_names=list(_VARIANT_COLUMNS.values()))
+
+    # Check which rows are primary definitions (not just a single variant defining part of an allele)
+    # We assume 'REFERENCE' or 'substitution'/'deletion' etc. in 'Type' column
+    # and non-empty 'rsID'/'Variant Start' for actual variants.
+    rsids, variant_starts = variant_columns[0], variant_columns[2]
+    is_reference = pc.equal(pc.utf8_lower(rsids), 'reference')
+    has_variant = pc.or_(pc.not_equal(rsids, ''), pc.not_equal(variant_starts, ''))
+    is_primary = pc.or_(is_reference, pc.invert(has_variant))
+
+    rows = pa.table({
+        'raw': allele_names_raw,
+        'allele': normalized_alleles,
+        'position': pa.array(np.arange(table.num_rows)),
+        'is_primary': is_primary,
+        'has_variant': has_variant,
+        'variant': variants,
+    })
+    # Skip malformed rows without an allele name
+    rows = rows.filter(pc.not_equal(rows['raw'], ''))
+
+    # A primary (e.g. 'REFERENCE') row replaces any definition collected so far for its allele,
+    # so each allele's definition starts at its last primary row, or at its first row if it has none.
+    rows = rows.append_column('primary_position', pc.if_else(rows['is_primary'], rows['position'], -1))
+    starts = rows.group_by('allele', use_threads=False).aggregate([('position', 'min'), ('primary_position', 'max')])
+    starts = pa.table({
+        'allele': starts['allele'],
+        'first_position': starts['position_min'],
+        'definition_start': pc.if_else(
+            pc.greater_equal(starts['primary_position_max'], 0), starts['primary_position_max'], starts['position_min']
+        ),
+    })
+    # Broadcast the per-allele starts back onto the rows (join does not preserve order, so re-sort by position)
+    row_starts = rows.select(['allele', 'position']).join(starts, 'allele').sort_by('position')
+    rows = rows.append_column('first_position', row_starts['first_position'])
+    rows = rows.append_column('definition_start', row_starts['definition_start'])
+    in_definition = pc.greater_equal(rows['position'], rows['definition_start'])
+
+    # Collect the variant details of every allele, in file order. Sorting by (first_position, position)
+    # makes each allele's rows contiguous, so the struct column can be sliced into per-allele lists by offsets.
+    variant_rows = (
+        rows.filter(pc.and_(in_definition, rows['has_variant']))
+        .sort_by([('first_position', 'ascending'), ('position', 'ascending')])
+    )
+    # group_by does not keep first-appearance order, so the runs are read off variant_rows itself:
+    # each allele is one run of equal first_position, and the run starts give the list offsets.
+    first_positions = variant_rows['first_position'].to_numpy()
+    run_starts = np.flatnonzero(np.diff(first_positions, prepend=-1))
+    offsets = np.append(run_starts, len(first_positions)).astype(np.int32)
+    variant_lists = pa.ListArray.from_arrays(offsets, variant_rows['variant'].combine_chunks())
+    run_alleles = variant_rows['allele'].take(pa.array(run_starts))
+
+    # rsIDs, reference sequences and variant types repeat across many rows (and alleles),
+    # so equal values are pooled to share a single string object.
+    details_by_allele: Dict[str, List[Dict[str, str]]] = {}
+    string_pool: Dict[str, str] = {}
+    pooled = string_pool.setdefault
+    for allele, records in zip(run_alleles.to_pylist(), variant_lists.to_pylist()):
+        for variant_info in records:
+            for key in _POOLED_VARIANT_KEYS:
+                value = variant_info[key]
+                variant_info[key] = pooled(value, value)
+        details_by_allele[allele] = records
+
+    # Create a mapping for primary alleles and their aliases/sub-alleles, one entry per allele, in order of first appearance
+    definition_rows = (
+        rows.filter(pc.equal(rows['position'], rows['definition_start']))
+        .sort_by('first_position')
+        .select(['allele', 'raw', 'is_primary'])
+        .to_pylist()
+    )
+    for row in definition_rows:
+        normalized_allele = row['allele']
         # Store the definition, including variant details
-        # Check if this is a primary definition (not just a single variant defining part of an allele)
-        # We assume 'REFERENCE' or 'substitution'/'deletion' etc. in 'Type' column
-        # and non-empty 'rsID'/'Variant Start' for actual variants.
-        is_primary_definition = (
-            str(row.get('rsID', '')).strip().lower() == 'reference' or
-            (str(row.get('rsID', '')).strip() == '' and str(row.get('Variant Start', '')).strip() == '')
-        )
-        
-        if normalized_allele not in gene_data["definitions"] or is_primary_definition:
-            # Only overwrite if it's the first entry for this normalized allele,
-            # or if it's explicitly a 'REFERENCE' definition (which we want as the primary)
-            gene_data["definitions"][normalized_allele] = {
-                "raw_pharmvar_name": allele_name_raw,
-                "variant_details": [], # Will store a list of associated variants
-                # Functionality will be added externally via PharmVarManager
-            }
-            if is_primary_definition: # Mark primary definition for later
-                gene_data["definitions"][normalized_allele]["is_primary_definition"] = True
-
-
-        # Add variant details to the allele definition if available
-        # Haplotypes.tsv lists variants for an allele, so we collect them.
-        rsid = str(row.get('rsID', '')).strip()
-        variant_start = str(row.get('Variant Start', '')).strip()
-        variant_type = str(row.get('Type', '')).strip()
-        
-        if rsid or variant_start: # If there's actual variant information
-            variant_info = {
-                "rsID": rsid,
-                "reference_sequence": str(row.get('ReferenceSequence', '')).strip(),
-                "variant_start": variant_start,
-                "variant_stop": str(row.get('Variant Stop', '')).strip(),
-                "reference_allele": str(row.get('Reference Allele', '')).strip(),
-                "variant_allele": str(row.get('Variant Allele', '')).strip(),
-                "type": variant_type
-            }
-            # Ensure 'variant_details' is a list
-            if "variant_details" not in gene_data["definitions"][normalized_allele]:
-                gene_data["definitions"][normalized_allele]["variant_details"] = []
-            gene_data["definitions"][normalized_allele]["variant_details"].append(variant_info)
-
-        # Add common aliases pointing to the normalized allele
-        # This is where we account for different ways tools might name an allele.
-        # This will need to be refined based on actual tool outputs.
-        if allele_name_raw not in gene_data["definitions"]:
-            gene_data["definitions"][allele_name_raw] = {"maps_to": normalized_allele}
-        if f"{gene_name}{normalized_allele}" not in gene_data["definitions"]:
-             gene_data["definitions"][f"{gene_name}{normalized_allele}"] = {"maps_to": normalized_allele}
+        # Functionality will be added externally via PharmVarManager
+        definition: Dict[str, Any] = {
+            "raw_pharmvar_name": row['raw'],
+            "variant_details": details_by_allele.get(normalized_allele, []),
+        }
+        if row['is_primary']: # Mark primary definition for later
+            definition["is_primary_definition"] = True
+        gene_data["definitions"][normalized_allele] = definition
 
+    # Add common aliases pointing to the normalized allele, once per distinct raw name
+    # This is where we account for different ways tools might name an allele.
+    # This will need to be refined based on actual tool outputs.
+    seen_aliases = (
+        rows.group_by(['raw', 'allele'], use_threads=False)
+        .aggregate([('position', 'min')])
+        .sort_by('position_min')
+    )
+    add_alias = gene_data["definitions"].setdefault
+    for allele_name_raw, normalized_allele in zip(seen_aliases['raw'].to_pylist(), seen_aliases['allele'].to_pylist()):
+        add_alias(allele_name_raw, {"maps_to": normalized_allele})
+        add_alias(f"{gene_name}{normalized_allele}", {"maps_to": normalized_allele})
 
     return gene_data
 
+def _process_gene_task(gene: str, pharmvar_release_dir: str, ref_genome: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Locates the haplotypes TSV of one gene within a PharmVar release download and processes it.
+    Runs in a worker process; returns (gene, processed data or None).
+    """
+    # Path includes the gene and selected reference genome below the release directory
+    gene_specific_dir = os.path.join(pharmvar_release_dir, gene, ref_genome)
+
+    if not os.path.isdir(gene_specific_dir):
+        logger.warning("Gene specific directory not found for %s (%s) at %s. Skipping.", gene, ref_genome, gene_specific_dir)
+        return gene, None
+
+    tsv_candidates = [f for f in os.listdir(gene_specific_dir) if f.startswith(f"{gene}.NC_") and f.endswith(".haplotypes.tsv")]
+
+    if not tsv_candidates:
+        logger.warning("No .haplotypes.tsv file found for %s in %s. Skipping.", gene, gene_specific_dir)
+        return gene, None
+
+    tsv_filename = tsv_candidates[0]
+    tsv_path = os.path.join(gene_specific_dir, tsv_filename)
+
+    return gene, load_and_process_gene_pharmvar(gene, tsv_path)
+
+def _bounded_map(
+    executor: concurrent.futures.Executor, fn: Callable[[Any], Any], items: Iterable[Any], max_in_flight: int
+) -> Iterator[Any]:
+    """
+    Like executor.map(fn, items), but keeps at most `max_in_flight` tasks submitted ahead of the consumer.
+    executor.map submits every item up front, so finished results would pile up while the consumer lags behind.
+    Results are yielded in input order.
+    """
+    pending: "collections.deque[concurrent.futures.Future]" = collections.deque()
+    for item in items:
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+        pending.append(executor.submit(fn, item))
+    while pending:
+        yield pending.popleft().result()
+
+def _write_processed_db(
+    f: BinaryIO, metadata: Dict[str, Any], gene_results: Iterable[Tuple[str, Optional[Dict[str, Any]]]]
+) -> int:
+    """
+    Streams the processed PharmVar DB to the binary file `f`, one gene at a time.
+    The output is byte-identical to orjson.dumps({"metadata": ..., "genes": {...}}, option=OPT_INDENT_2).
+    Genes without data are skipped with a warning. Returns the number of genes written.
+    """
+    f.write(b'{\n  "metadata": ')
+    f.write(orjson.dumps(metadata, option=orjson.OPT_INDENT_2).replace(b'\n', b'\n  '))
+    f.write(b',\n  "genes": {')
+
+    genes_written = 0
+    for gene, gene_processed_data in gene_results:
+        if not gene_processed_data:
+            logger.warning("No PharmVar data successfully loaded for %s.", gene)
+            continue
+        f.write(b',\n    ' if genes_written else b'\n    ')
+        f.write(orjson.dumps(gene))
+        f.write(b': ')
+        f.write(orjson.dumps(gene_processed_data, option=orjson.OPT_INDENT_2).replace(b'\n', b'\n    '))
+        genes_written += 1
+
+    f.write(b'\n  }\n}' if genes_written else b'}\n}')
+    return genes_written
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Process raw PharmVar haplotype definitions into a consolidated JSON database."
@@ -115,6 +284,8 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
     # Extract arguments
     selected_ref_genome = args.ref_genome
     pharmvar_version = args.pharmvar_version
@@ -128,51 +299,32 @@ if __name__ == "__main__":
     pharmvar_root_dir = os.path.join(os.path.dirname(__file__), "data")
     output_json_path = os.path.join(pharmvar_root_dir, "pharmvar_processed.json")
 
-    all_pharmvar_data = {
-        "metadata": {
-            "pharmvar_version": pharmvar_version,
-            "reference_genome": selected_ref_genome,
-            "processed_on": pd.Timestamp.now().isoformat(),
-            "core_panel_genes": core_panel
-        },
-        "genes": {}
+    metadata = {
+        "pharmvar_version": pharmvar_version,
+        "reference_genome": selected_ref_genome,
+        "processed_on": datetime.now(timezone.utc).isoformat(),
+        "core_panel_genes": core_panel
     }
 
-    for gene in core_panel:
-        # Path now includes raw_download_dir_name, pharmvar_version, gene, and selected_ref_genome
-        gene_specific_dir = os.path.join(
-            pharmvar_root_dir,
-            raw_download_dir_name,
-            f"pharmvar-{pharmvar_version}", # Dynamic version in path
-            gene,
-            selected_ref_genome
-        )
-
-        if not os.path.isdir(gene_specific_dir):
-            print(f"Warning: Gene specific directory not found for {gene} ({selected_ref_genome}) at {gene_specific_dir}. Skipping.")
-            continue
-
-        tsv_candidates = [f for f in os.listdir(gene_specific_dir) if f.startswith(f"{gene}.NC_") and f.endswith(".haplotypes.tsv")]
-
-        if not tsv_candidates:
-            print(f"Warning: No .haplotypes.tsv file found for {gene} in {gene_specific_dir}. Skipping.")
-            continue
-
-        tsv_filename = tsv_candidates[0]
-        tsv_path = os.path.join(gene_specific_dir, tsv_filename)
-
-        gene_processed_data = load_and_process_gene_pharmvar(gene, tsv_path)
-
-        if gene_processed_data:
-            all_pharmvar_data["genes"][gene] = gene_processed_data
-        else:
-            print(f"Warning: No PharmVar data successfully loaded for {gene}.")
+    # Genes are independent of each other, so each one is read and processed in its own worker process
+    pharmvar_release_dir = os.path.join(
+        pharmvar_root_dir,
+        raw_download_dir_name,
+        f"pharmvar-{pharmvar_version}" # Dynamic version in path
+    )
+    process_gene = functools.partial(
+        _process_gene_task, pharmvar_release_dir=pharmvar_release_dir, ref_genome=selected_ref_genome
+    )
 
     try:
-        with open(output_json_path, "w") as f:
-            json.dump(all_pharmvar_data, f, indent=4)
-        print(f"\nSuccessfully processed PharmVar data for {len(all_pharmvar_data['genes'])} genes.")
+        # Each gene is written out as soon as it arrives, and no more genes are submitted than there are workers,
+        # so at most `workers` genes' data are held at a time
+        workers = min(len(core_panel), os.cpu_count() or 1)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor, open(output_json_path, "wb") as f:
+            gene_results = _bounded_map(executor, process_gene, core_panel, max_in_flight=workers)
+            genes_written = _write_processed_db(f, metadata, gene_results)
+        print(f"\nSuccessfully processed PharmVar data for {genes_written} genes.")
         print(f"Aggregated data saved to: {output_json_path}")
         print(f"Reference Genome used: {selected_ref_genome}")
     except Exception as e:
-        print(f"Error saving processed PharmVar data: {e}")
\ No newline at end of file
+        print(f"Error saving processed PharmVar data: {e}")
@@ -1,6 +1,123 @@
-import json
 import os
-from typing import Dict, List, Optional, Any
+import re
+import logging
+import functools
+import orjson
+from types import MappingProxyType
+from typing import Dict, List, Optional, Any, Tuple, Mapping
+
+logger = logging.getLogger(__name__)
+
+@functools.lru_cache(maxsize=4)
+def _load_db_cached(path: str, mtime: float) -> Dict[str, Any]:
+    """
+    Decodes the processed PharmVar JSON at `path`. Results are cached per (path, mtime),
+    so all PharmVarManager instances share one parsed DB until the file changes on disk.
+    The returned dict is shared by reference and must not be mutated.
+    """
+    try:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    except orjson.JSONDecodeError as e:
+        raise ValueError(f"Error decoding PharmVar JSON from '{path}': {e}")
+    except Exception as e:
+        raise RuntimeError(f"Unexpected error loading PharmVar DB: {e}")
+
+@functools.lru_cache(maxsize=None)
+def _gene_prefix_re(gene_name: str) -> "re.Pattern[str]":
+    """Returns the compiled pattern matching an optional leading gene prefix and '*' (e.g. 'CYP2D6*')."""
+    return re.compile(rf'^\s*(?:{re.escape(gene_name)})?\s*\**')
+
+@functools.lru_cache(maxsize=4096)
+def _normalize_allele_form(gene_name: str, raw_allele: str) -> str:
+    """
+    Strips the gene prefix and '*' from a raw allele string and returns it in the '*' form ('CYP2D6*4' -> '*4').
+    Memoized, since the same allele strings repeat across samples.
+    """
+    return '*' + _gene_prefix_re(gene_name).sub('', raw_allele, count=1).strip()
+
+
+# Example of Manually Curated Mappings for Functionality and Phenotype
+# Read-only module-level constants, shared by all PharmVarManager instances.
+# These should be based on CPIC guidelines and PharmVar functional annotations.
+# This is a simplified example with placeholders that should illustrate the structure
+_ALLELE_FUNCTIONALITY_MAP: Mapping[str, Mapping[str, str]] = MappingProxyType({
+    "CYP2D6": MappingProxyType({
+        "*1": "Normal Function", "*2": "Normal Function", "*10": "Decreased Function",
+        "*4": "No Function", "*5": "No Function", "*6": "No Function",
+        "*xN": "Increased Function", # For gene duplications like *1x2, *2xN
+        "UNKNOWN": "Unknown" # Placeholder for alleles not found in this map
+    }),
+    "CYP2C9": MappingProxyType({
+        "*1": "Normal Function", "*2": "Decreased Function", "*3": "No Function",
+        "UNKNOWN": "Unknown"
+    }),
+    "CYP2C19": MappingProxyType({
+        "*1": "Normal Function", "*2": "No Function", "*3": "No Function",
+        "*17": "Increased Function",
+        "UNKNOWN": "Unknown"
+    }),
+    "CYP2B6": MappingProxyType({
+        "*1": "Normal Function", "*6": "Decreased Function", "*18": "No Function",
+        "UNKNOWN": "Unknown"
+    }),
+    "CYP3A5": MappingProxyType({
+        "*1": "Normal Function", "*3": "No Function",
+        "UNKNOWN": "Unknown"
+    }),
+    "TPMT": MappingProxyType({
+        "*1": "Normal Function", "*2": "Decreased Function", "*3A": "No Function",
+        "*3B": "No Function", "*3C": "No Function",
+        "UNKNOWN": "Unknown"
+    }),
+    "DPYD": MappingProxyType({
+        "*1": "Normal Function", "*2A": "No Function", # Common alias for *2A
+        "UNKNOWN": "Unknown"
+    }),
+    "UGT1A1": MappingProxyType({
+        "*1": "Normal Function", "*6": "Decreased Function", "*28": "Decreased Function",
+        "UNKNOWN": "Unknown"
+    }),
+    "SLCO1B1": MappingProxyType({
+        "*1A": "Normal Function", "*5": "Decreased Function", "*15": "Decreased Function",
+        "UNKNOWN": "Unknown"
+    }),
+    "CYP3A4": MappingProxyType({
+        "*1": "Normal Function", "*22": "Decreased Function",
+        "UNKNOWN": "Unknown"
+    }),
+    "VKORC1": MappingProxyType({
+        "*1": "Normal Function",
+        "rs9923231": "Decreased Function",
+        "UNKNOWN": "Unknown"
+    }),
+    "F5": MappingProxyType({
+        "*1": "Normal Function",
+        "rs6025": "Increased Function",
+        "UNKNOWN": "Unknown"
+    }),
+    "CYP1A2": MappingProxyType({
+        "*1": "Normal Function", "*1F": "Increased Function", "*1C": "Decreased Function",
+        "UNKNOWN": "Unknown"
+    })
+
+})
+
+# Standardized Phenotype Abbreviations (CPIC-like)
+_PHENOTYPE_MAP: Mapping[str, str] = MappingProxyType({
+    "Normal Function": "NM",
+    "Increased Function": "UM",
+    "Decreased Function": "IM",
+    "No Function": "PM",
+    "Unknown": "Unknown",
+    "Uncertain Function": "Indeterminate",
+
+    "Normal": "Normal",
+    "Reduced": "Reduced",
+    "Increased": "Increased",
+    "Non-functional": "Non-functional",
+})
+
 
 class PharmVarManager:
     """
@@ -14,88 +131,20 @@ class PharmVarManager:
         self.processed_pharmvar_path = processed_pharmvar_path
         self.pharmvar_db: Dict[str, Any] = self._load_pharmvar_db()
         self.supported_genes: List[str] = list(self.pharmvar_db.get("genes", {}).keys()) # Adjusted for new JSON structure
-        print(f"PharmVarManager initialized. Loaded allele definitions for {len(self.supported_genes)} genes.")
-
-    # Example of Manually Curated Mappings for Functionality and Phenotype
-    # These should be based on CPIC guidelines and PharmVar functional annotations.
-    # This is a simplified example with placeholders that should illustrate the structure
-    _allele_functionality_map = {
-        "CYP2D6": {
-            "*1": "Normal Function", "*2": "Normal Function", "*10": "Decreased Function",
-            "*4": "No Function", "*5": "No Function", "*6": "No Function",
-            "*xN": "Increased Function", # For gene duplications like *1x2, *2xN
-            "UNKNOWN": "Unknown" # Placeholder for alleles not found in this map
-        },
-        "CYP2C9": {
-            "*1": "Normal Function", "*2": "Decreased Function", "*3": "No Function",
-            "UNKNOWN": "Unknown"
-        },
-        "CYP2C19": {
-            "*1": "Normal Function", "*2": "No Function", "*3": "No Function",
-            "*17": "Increased Function",
-            "UNKNOWN": "Unknown"
-        },
-        "CYP2B6": {
-            "*1": "Normal Function", "*6": "Decreased Function", "*18": "No Function",
-            "UNKNOWN": "Unknown"
-        },
-        "CYP3A5": {
-            "*1": "Normal Function", "*3": "No Function",
-            "UNKNOWN": "Unknown"
-        },
-        "TPMT": {
-            "*1": "Normal Function", "*2": "Decreased Function", "*3A": "No Function",
-            "*3B": "No Function", "*3C": "No Function",
-            "UNKNOWN": "Unknown"
-        },
-        "DPYD": {
-            "*1": "Normal Function", "*2A": "No Function", # Common alias for *2A
-            "UNKNOWN": "Unknown"
-        },
-        "UGT1A1": {
-            "*1": "Normal Function", "*6": "Decreased Function", "*28": "Decreased Function",
-            "UNKNOWN": "Unknown"
-        },
-        "SLCO1B1": {
-            "*1A": "Normal Function", "*5": "Decreased Function", "*15": "Decreased Function",
-            "UNKNOWN": "Unknown"
-        },
-        "CYP3A4": {
-            "*1": "Normal Function", "*22": "Decreased Function",
-            "UNKNOWN": "Unknown"
-        },
-        "VKORC1": {
-            "*1": "Normal Function",
-            "rs9923231": "Decreased Function",
-            "UNKNOWN": "Unknown"
-        },
-        "F5": {
-            "*1": "Normal Function",
-            "rs6025": "Increased Function",
-            "UNKNOWN": "Unknown"
-        },
-        "CYP1A2": {
-            "*1": "Normal Function", "*1F": "Increased Function", "*1C": "Decreased Function",
-            "UNKNOWN": "Unknown"
+        self._alias: Dict[Tuple[str, str], str] = self._build_alias_lookup()
+        # Non-star alleles (e.g. rsIDs for VKORC1, F5) that only resolve to themselves if not found in the DB
+        self._functional_alleles = frozenset(
+            (gene_name, allele)
+            for gene_name in self.pharmvar_db.get("genes", {})
+            for allele in _ALLELE_FUNCTIONALITY_MAP.get(gene_name, {})
+        )
+        # Resolved functionality per (gene, allele); pre-filled with the curated map and extended on first miss
+        self._func_of: Dict[Tuple[str, str], str] = {
+            (gene_name, allele): functionality
+            for gene_name, alleles in _ALLELE_FUNCTIONALITY_MAP.items()
+            for allele, functionality in alleles.items()
         }
-
-    }
-
-    # Standardized Phenotype Abbreviations (CPIC-like)
-    _phenotype_map = {
-        "Normal Function": "NM",
-        "Increased Function": "UM",
-        "Decreased Function": "IM",
-        "No Function": "PM",
-        "Unknown": "Unknown",
-        "Uncertain Function": "Indeterminate",
-
-        "Normal": "Normal",
-        "Reduced": "Reduced",
-        "Increased": "Increased",
-        "Non-functional": "Non-functional",
-    }
-
+        logger.info("PharmVarManager initialized. Loaded allele definitions for %d genes.", len(self.supported_genes))
 
     def _load_pharmvar_db(self) -> Dict[str, Any]:
         """Loads the processed PharmVar allele definition data from the JSON file."""
@@ -104,19 +153,45 @@ class PharmVarManager:
                 f"Processed PharmVar DB not found at '{self.processed_pharmvar_path}'. "
                 "Please run 'src/data/load_pharmvar.py' first."
             )
-        try:
-            with open(self.processed_pharmvar_path, 'r') as f:
-                return json.load(f)
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Error decoding PharmVar JSON from '{self.processed_pharmvar_path}': {e}")
-        except Exception as e:
-            raise RuntimeError(f"Unexpected error loading PharmVar DB: {e}")
+        mtime = os.path.getmtime(self.processed_pharmvar_path)
+        return _load_db_cached(self.processed_pharmvar_path, mtime)
 
     def get_gene_info(self, gene_name: str) -> Optional[Dict[str, Any]]:
         """Returns all PharmVar allele definition information for a given gene."""
 
         return self.pharmvar_db.get("genes", {}).get(gene_name)
 
+    def _normalize_form(self, gene_name: str, raw_allele: str) -> str:
+        """Strips the gene prefix and '*' from a raw allele string and returns it in the '*' form ('CYP2D6*4' -> '*4')."""
+        return _normalize_allele_form(gene_name, raw_allele)
+
+    def _build_alias_lookup(self) -> Dict[Tuple[str, str], str]:
+        """
+        Flattens all allele names known for each gene into one {(gene, raw_allele): normalized_allele} dict,
+        so get_normalized_allele() resolves most inputs with a single hash lookup.
+        Direct definition keys take precedence over derived spellings of them.
+        """
+        alias: Dict[Tuple[str, str], str] = {}
+        derived: List[Tuple[Tuple[str, str], str]] = []
+
+        for gene_name, gene_data in self.pharmvar_db.get("genes", {}).items():
+            for allele, definition in gene_data.get("definitions", {}).items():
+                if "maps_to" in definition:
+                    normalized = definition["maps_to"] # Alias entry
+                else:
+                    normalized = self._normalize_form(gene_name, allele) # Primary definition
+                alias[(gene_name, allele)] = normalized
+
+                # Common spellings of a definition key that the normalization fallback would resolve to it
+                if self._normalize_form(gene_name, allele) == allele:
+                    derived.append(((gene_name, f"{gene_name}{allele}"), normalized))
+                    derived.append(((gene_name, allele.lstrip('*')), normalized))
+
+        for key, normalized in derived:
+            alias.setdefault(key, normalized)
+
+        return alias
+
     def get_normalized_allele(self, gene_name: str, raw_allele: str) -> Optional[str]:
         """
         Normalizes a raw allele string to its PharmVar standard nomenclature (e.g., '*1', '*4').
@@ -126,41 +201,20 @@ class PharmVarManager:
         if not gene_name or not raw_allele:
             return "UNKNOWN" # Return "UNKNOWN" for invalid inputs
 
-        gene_data = self.pharmvar_db.get("genes", {}).get(gene_name)
-        if not gene_data:
-            return "UNKNOWN"
-
-        definitions = gene_data.get("definitions", {})
-
-        # 1. Try direct lookup for exact match (e.g., if tool output is already normalized or an alias)
-        if raw_allele in definitions:
-            if "maps_to" in definitions[raw_allele]:
-                return definitions[raw_allele]["maps_to"] # Return target if it's an alias
-            else:
-                # It's a primary definition, but ensure it's in the * form
-                normalized_form = raw_allele.replace(gene_name, '').replace('*', '').strip()
-                if not normalized_form.startswith('*'):
-                    normalized_form = '*' + normalized_form
-                return normalized_form
-
-        # 2. Try normalizing by removing gene prefix and checking for '*'
-        # This handles cases like 'CYP2D6*4' becoming '*4'
-        normalized_form = raw_allele.replace(gene_name, '').replace('*', '').strip()
-        if not normalized_form.startswith('*'):
-            normalized_form = '*' + normalized_form
-        
-        if normalized_form in definitions:
-            if "maps_to" in definitions[normalized_form]:
-                return definitions[normalized_form]["maps_to"]
-            else:
-                return normalized_form
-        
+        # 1. Direct lookup (already normalized names, aliases and common spellings)
+        # 2. Otherwise normalize by removing gene prefix and checking for '*' (e.g., '2D6*10' -> '*10')
+        normalized = (
+            self._alias.get((gene_name, raw_allele))
+            or self._alias.get((gene_name, self._normalize_form(gene_name, raw_allele)))
+        )
+        if normalized:
+            return normalized
+
         # 3. Handle specific non-star allele cases like rsIDs for VKORC1, F5 etc.
         # If the raw_allele matches a known variant in the functionality map,
         # we treat it as a normalized allele for functionality lookup.
-        if gene_name in self._allele_functionality_map and \
-           raw_allele in self._allele_functionality_map[gene_name]:
-            return raw_allele # Return the raw allele as the 'normalized' form for these cases
+        if (gene_name, raw_allele) in self._functional_alleles:
+            return raw_allele
 
         # If still not found, return "UNKNOWN"
         return "UNKNOWN"
@@ -172,24 +226,28 @@ class PharmVarManager:
         for a given normalized PharmVar allele using the internal mapping.
         Returns "Unknown" if no mapping is found.
         """
-        if gene_name not in self._allele_functionality_map:
-            print(f"Warning: No functionality mapping defined for gene '{gene_name}'. Defaulting to 'Unknown'.")
-            return "Unknown"
-        
         # Try to get direct allele functionality (e.g., *1, *4, or a specific rsID for non-star allele genes)
-        functionality = self._allele_functionality_map[gene_name].get(normalized_allele)
+        # or a previously resolved fallback for this allele
+        key = (gene_name, normalized_allele)
+        functionality = self._func_of.get(key)
         if functionality:
             return functionality
-        
+
+        if gene_name not in _ALLELE_FUNCTIONALITY_MAP:
+            logger.warning("No functionality mapping defined for gene '%s'. Defaulting to 'Unknown'.", gene_name)
+            return "Unknown"
+
         # Handle allele groups like *xN for duplications (e.g., *1x2, *2xN)
         # This is a simplification; a robust solution will need a regex or more complex logic.
         if gene_name == "CYP2D6" and 'x' in normalized_allele:
             # Check for patterns like *1X2, *2XN, *1x3 etc.
-            if 'x' in normalized_allele.lower():
-                return self._allele_functionality_map[gene_name].get("*xN", "Unknown")
+            functionality = _ALLELE_FUNCTIONALITY_MAP[gene_name].get("*xN", "Unknown")
+        else:
+            # Fallback for alleles not explicitly defined in the map
+            functionality = _ALLELE_FUNCTIONALITY_MAP[gene_name].get("UNKNOWN", "Unknown")
 
-        # Fallback for alleles not explicitly defined in the map
-        return self._allele_functionality_map[gene_name].get("UNKNOWN", "Unknown")
+        self._func_of[key] = functionality
+        return functionality
 
 
     def get_standard_phenotype(self, functionality: str) -> Optional[str]:
@@ -199,11 +257,12 @@ class PharmVarManager:
         Returns "Unknown" if no mapping is found.
         """
         # Use the generic phenotype map directly
-        return self._phenotype_map.get(functionality, "Unknown")
+        return _PHENOTYPE_MAP.get(functionality, "Unknown")
 
 
 if __name__ == "__main__":
-    
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
     print("--- Testing PharmVarManager ---")
     try:
         manager = PharmVarManager()
@@ -1,9 +1,15 @@
-from typing import List, Dict, Any, Optional
-from collections import defaultdict
-import json # Added for debugging print
+from typing import List, Dict, Any, NamedTuple, Optional, Tuple, Union
+from dataclasses import dataclass
+from operator import itemgetter
+import logging
+import sys
 
+import numpy as np
 
-from src.standard_formats import StandardizedGeneCall
+
+from src.standard_formats import StandardizedGeneCall, iter_variants_reported
+
+logger = logging.getLogger(__name__)
 
 def group_gene_calls_by_sample_gene(gene_calls: List[StandardizedGeneCall]) -> Dict[str, Dict[str, List[StandardizedGeneCall]]]:
     """
@@ -20,20 +26,121 @@ def group_gene_calls_by_sample_gene(gene_calls: List[StandardizedGeneCall]) -> D
         "sample_id_2": { ... }
     }
     """
-    grouped_data: Dict[str, Dict[str, List[StandardizedGeneCall]]] = defaultdict(lambda: defaultdict(list))
+    # Bucket calls under a flat (sample_id, gene) key first: one hash lookup per call
+    # instead of walking two levels of nested dicts.
+    calls_by_key: Dict[Tuple[str, str], List[StandardizedGeneCall]] = {}
+    get_bucket = calls_by_key.get
 
     for call in gene_calls:
         sample_id = call.get('sample_id')
         gene = call.get('gene')
 
         if sample_id and gene:
-            grouped_data[sample_id][gene].append(call)
+            key = (sample_id, gene)
+            bucket = get_bucket(key)
+            if bucket is None:
+                calls_by_key[key] = [call]
+            else:
+                bucket.append(call)
         else:
-            print(f"Warning: Skipping gene call due to missing sample_id or gene in: {call.get('input_file', 'unknown_file')}")
+            logger.warning("Skipping gene call due to missing sample_id or gene in: %s", call.get('input_file', 'unknown_file'))
+
+    grouped_data: Dict[str, Dict[str, List[StandardizedGeneCall]]] = {}
+    genes_of_sample = grouped_data.setdefault
+    for (sample_id, gene), calls in calls_by_key.items():
+        genes_of_sample(sample_id, {})[gene] = calls
 
     return grouped_data
 
 
+def _solution_id_sort_key(call: StandardizedGeneCall) -> int:
+    """
+    Sort key ranking calls by ALDY SolutionID (lowest first), using the int precomputed by the parser.
+    Calls built elsewhere fall back to converting the string aldy_solution_id; calls without one rank last.
+    """
+    raw_tool_output = call.get('raw_tool_output', {})
+    solution_id = raw_tool_output.get('aldy_solution_id_int')
+    if solution_id is None:
+        solution_id = int(raw_tool_output.get('aldy_solution_id') or sys.maxsize)
+    return solution_id
+
+
+class _RankedCall(NamedTuple):
+    """
+    Selection view of one StandardizedGeneCall, extracted once from the call dict.
+    Fields are ordered so that tuple comparison ranks NORMAL solutions first, then
+    by lowest SolutionID.
+    """
+    not_normal: bool
+    solution_id: int
+    call: StandardizedGeneCall
+
+
+_RANK_KEY = itemgetter(0, 1)
+
+
+def _rank_call(call: StandardizedGeneCall) -> _RankedCall:
+    """Builds the _RankedCall for one call; only ALDY calls can be NORMAL."""
+    has_normal_status = call.get('tool_name') == "ALDY" and any(
+        'NORMAL' in (variant.get('tool_specific_flags') or '')
+        for variant in iter_variants_reported(call.get('raw_tool_output', {}))
+    )
+    return _RankedCall(not has_normal_status, _solution_id_sort_key(call), call)
+
+
+@dataclass
+class ParsedBatch:
+    """
+    Columnar (struct-of-arrays) view of a list of StandardizedGeneCall objects for
+    GeneCallNormalizer.normalize_batch(): the scalar fields that solution selection needs
+    live in NumPy arrays, one entry per call, and the call dicts themselves are only
+    touched once the winners are known.
+    """
+    sample_codes: np.ndarray  # int64: sample_id, numbered in order of first appearance
+    pair_codes: np.ndarray    # int64: (sample_id, gene), numbered in order of first appearance
+    not_normal: np.ndarray    # bool: False for ALDY calls with a NORMAL variant (see _rank_call)
+    solution_id: np.ndarray   # int64: see _solution_id_sort_key
+    calls: List[StandardizedGeneCall]
+
+    @classmethod
+    def from_calls(cls, gene_calls: List[StandardizedGeneCall]) -> "ParsedBatch":
+        """
+        Builds the batch in one pass over the calls. Calls without a sample_id or gene are
+        skipped with a warning, as in group_gene_calls_by_sample_gene().
+        """
+        sample_codes: Dict[str, int] = {}
+        pair_codes: Dict[Tuple[str, str], int] = {}
+        sample_of_call: List[int] = []
+        pair_of_call: List[int] = []
+        ranked_calls: List[_RankedCall] = []
+
+        for call in gene_calls:
+            sample_id = call.get('sample_id')
+            gene = call.get('gene')
+            if not (sample_id and gene):
+                logger.warning("Skipping gene call due to missing sample_id or gene in: %s", call.get('input_file', 'unknown_file'))
+                continue
+            sample_of_call.append(sample_codes.setdefault(sample_id, len(sample_codes)))
+            pair_of_call.append(pair_codes.setdefault((sample_id, gene), len(pair_codes)))
+            ranked_calls.append(_rank_call(call))
+
+        n_calls = len(ranked_calls)
+        return cls(
+            sample_codes=np.array(sample_of_call, dtype=np.int64),
+            pair_codes=np.array(pair_of_call, dtype=np.int64),
+            not_normal=np.fromiter((ranked.not_normal for ranked in ranked_calls), dtype=np.bool_, count=n_calls),
+            solution_id=np.fromiter((ranked.solution_id for ranked in ranked_calls), dtype=np.int64, count=n_calls),
+            calls=[ranked.call for ranked in ranked_calls],
+        )
+
+    def __len__(self) -> int:
+        return len(self.calls)
+
+    def to_list_of_dicts(self) -> List[StandardizedGeneCall]:
+        """Returns the calls of the batch as a plain list, for callers that expect parse() output."""
+        return list(self.calls)
+
+
 class GeneCallNormalizer:
     """
     Normalizes a list of StandardizedGeneCall objects for a *single gene*
@@ -45,7 +152,6 @@ class GeneCallNormalizer:
         specific normalization rules, reference data paths, etc.
         """
         self.config = config if config else {}
-        print("GeneCallNormalizer initialized for single gene/sample normalization.")
 
     def normalize(self, gene_calls_for_one_sample_one_gene: List[StandardizedGeneCall]) -> Optional[StandardizedGeneCall]:
         """
@@ -63,7 +169,7 @@ class GeneCallNormalizer:
                                             call could be determined from the input.
         """
         if not gene_calls_for_one_sample_one_gene:
-            print("Warning: Normalizer received an empty list for a single gene/sample. Returning None.")
+            logger.warning("Normalizer received an empty list for a single gene/sample. Returning None.")
             return None
 
         # Confirm all calls are for the same sample and gene (for robustness)
@@ -71,77 +177,36 @@ class GeneCallNormalizer:
         sample_id = first_call.get('sample_id')
         gene = first_call.get('gene')
 
-        # Add a check for consistency
-        for call in gene_calls_for_one_sample_one_gene:
-            if call.get('sample_id') != sample_id or call.get('gene') != gene:
-                print(f"Error: Inconsistent sample_id or gene found in input list for normalizer. "
-                      f"Expected {sample_id}:{gene}, but found {call.get('sample_id')}:{call.get('gene')}. "
-                      "This list should only contain calls for one sample-gene pair.")
-                return None
+        # Add a check for consistency (stops at the first mismatching call)
+        inconsistent_call = next(
+            (call for call in gene_calls_for_one_sample_one_gene
+             if call.get('sample_id') != sample_id or call.get('gene') != gene),
+            None
+        )
+        if inconsistent_call is not None:
+            logger.error("Inconsistent sample_id or gene found in input list for normalizer. "
+                         "Expected %s:%s, but found %s:%s. "
+                         "This list should only contain calls for one sample-gene pair.",
+                         sample_id, gene, inconsistent_call.get('sample_id'), inconsistent_call.get('gene'))
+            return None
 
-        print(f"  Normalizing {len(gene_calls_for_one_sample_one_gene)} calls for Sample: {sample_id}, Gene: {gene}")
+        logger.debug("Normalizing %d calls for Sample: %s, Gene: %s", len(gene_calls_for_one_sample_one_gene), sample_id, gene)
 
         # Solution Selection Logic
-        best_solution: Optional[StandardizedGeneCall] = None
-        
-        # Filter for "NORMAL" solutions first
-        normal_solutions: List[StandardizedGeneCall] = []
-        other_solutions: List[StandardizedGeneCall] = []
-
-        for call in gene_calls_for_one_sample_one_gene:
-            # Check if it's an ALDY call (assuming this for now for the rule)
-            if call.get('tool_name') == "ALDY":
-                # ALDY's raw output contains 'variants_reported' which has 'tool_specific_flags'.
-                # We need to look for 'NORMAL' in these flags.
-                # A simplistic approach is to check if any variant reported has 'NORMAL' status.
-                # A more robust approach might be to define a 'primary_status' field in StandardizedGeneCall
-                # during parsing, or aggregate status from multiple variants.
-                
-                # For ALDY, the 'VariantStatus' from the major/minor allele definition lines (Solution 1: *1.001, *4, *4.021)
-                # is not directly available in `variants_reported` (which are for the actual variants).
-                # However, the `VariantStatus` column (NORMAL, NOVEL, EXTRA, MISSING) exists in the raw TSV.
-                # The AldyParser maps this to `VariantReported['tool_specific_flags']`.
-                # Let's assume for this basic rule, we check the 'VariantStatus' from *any* variant reported
-                # or a general flag if the parser extracted it at the solution level.
-                
-                # For now, let's rely on `aldy_solution_id` and the solution description for a simple heuristic
-                # given the challenge of aggregating 'VariantStatus' across multiple lines into one solution object.
-                # A better approach for Aldy-specific selection often involves the 'SolutionID' itself
-                # or a more complex analysis of all alleles/variants in the solution.
-
-                # Let's refine the heuristic to rely on a general "NORMAL" presence in `VariantStatus`
-                # of *any* reported variant associated with the solution, or the SolutionID directly.
-                # The 'VariantStatus' column (e.g., NORMAL, NOVEL) is captured in `VariantReported['tool_specific_flags']`.
-                
-                has_normal_status = False
-                for variant in call.get('raw_tool_output', {}).get('variants_reported', []):
-                    flags = variant.get('tool_specific_flags', '')
-                    if 'NORMAL' in flags: # Checks if 'NORMAL' is present in any variant's flags
-                        has_normal_status = True
-                        break
-                
-                if has_normal_status:
-                    normal_solutions.append(call)
-                else:
-                    other_solutions.append(call)
+        # Each call's dict is walked exactly once into a _RankedCall; selection then
+        # compares tuple fields only. "NORMAL" solutions win, lowest SolutionID first.
+        #
+        # For ALDY, the 'VariantStatus' column (e.g., NORMAL, NOVEL) of the raw TSV is
+        # captured in `VariantReported['tool_specific_flags']`, so a solution counts as
+        # "NORMAL" if any of its reported variants carries that status. Calls from other
+        # tools, or without such a variant, are ranked after the NORMAL ones.
+        best = min(map(_rank_call, gene_calls_for_one_sample_one_gene), key=_RANK_KEY)
+        best_solution = best.call
+        if logger.isEnabledFor(logging.DEBUG):
+            if best.not_normal:
+                logger.debug("No 'NORMAL' solution found. Selected other solution with SolutionID: %s", best_solution.get('raw_tool_output', {}).get('aldy_solution_id'))
             else:
-                # If from another tool, or no specific ALDY rule applies, treat as "other"
-                other_solutions.append(call)
-
-        if normal_solutions:
-            # If there are "NORMAL" solutions, pick the one with the lowest SolutionID
-            # Need to convert aldy_solution_id to int for proper sorting
-            normal_solutions.sort(key=lambda x: int(x.get('raw_tool_output', {}).get('aldy_solution_id', sys.maxsize)))
-            best_solution = normal_solutions[0]
-            print(f"    Selected 'NORMAL' solution with SolutionID: {best_solution.get('raw_tool_output', {}).get('aldy_solution_id')}")
-        elif other_solutions:
-            # If no "NORMAL" solutions, pick the one with the lowest SolutionID from the rest
-            other_solutions.sort(key=lambda x: int(x.get('raw_tool_output', {}).get('aldy_solution_id', sys.maxsize)))
-            best_solution = other_solutions[0]
-            print(f"    No 'NORMAL' solution found. Selected other solution with SolutionID: {best_solution.get('raw_tool_output', {}).get('aldy_solution_id')}")
-        else:
-            print(f"    Could not determine a best solution for {sample_id}:{gene}.")
-            return None # No solutions provided or none could be selected
+                logger.debug("Selected 'NORMAL' solution with SolutionID: %s", best_solution.get('raw_tool_output', {}).get('aldy_solution_id'))
 
         # Data Harmonization & Enrichment
         # Once 'best_solution' is determined:
@@ -152,6 +217,55 @@ class GeneCallNormalizer:
         best_solution['normalized_functional_status'] = "Normal Function (Inferred)"
         best_solution['predicted_phenotype'] = "Normal Metabolizer (Inferred)"
 
-        print(f"  Returning normalized call for {sample_id}:{gene}.")
+        logger.debug("Returning normalized call for %s:%s.", sample_id, gene)
 
-        return best_solution
\ No newline at end of file
+        return best_solution
+
+    def normalize_batch(self, gene_calls: Union[List[StandardizedGeneCall], ParsedBatch]) -> List[StandardizedGeneCall]:
+        """
+        Normalizes an ungrouped list of calls for many samples and genes in one pass.
+        Equivalent to normalize_grouped(group_gene_calls_by_sample_gene(gene_calls)),
+        including the order of the results, but selects the best solution of every
+        sample/gene pair with a single NumPy sort instead of one normalize() call per pair.
+        Accepts a ParsedBatch (built once with ParsedBatch.from_calls()) or a plain list of
+        calls, which is converted first. Calls without a sample_id or gene are skipped.
+        """
+        batch = gene_calls if isinstance(gene_calls, ParsedBatch) else ParsedBatch.from_calls(gene_calls)
+        if not len(batch):
+            return []
+
+        # Sort by sample, then sample/gene pair (both in order of first appearance), then by rank;
+        # lexsort is stable, so ties keep input order just like min() in normalize().
+        order = np.lexsort((batch.solution_id, batch.not_normal, batch.pair_codes, batch.sample_codes))
+        # The first row of every pair in sorted order is that pair's best solution
+        sorted_pairs = batch.pair_codes[order]
+        is_first = np.empty(len(order), dtype=np.bool_)
+        is_first[0] = True
+        np.not_equal(sorted_pairs[1:], sorted_pairs[:-1], out=is_first[1:])
+
+        calls = batch.calls
+        normalized_results = [calls[i] for i in order[is_first].tolist()]
+        for best_solution in normalized_results:
+            # Same enrichment as normalize()
+            best_solution['normalized_functional_status'] = "Normal Function (Inferred)"
+            best_solution['predicted_phenotype'] = "Normal Metabolizer (Inferred)"
+
+        logger.info("Normalized %d gene calls.", len(normalized_results))
+        return normalized_results
+
+    def normalize_grouped(self, grouped_calls: Dict[str, Dict[str, List[StandardizedGeneCall]]]) -> List[StandardizedGeneCall]:
+        """
+        Normalizes every sample/gene group produced by group_gene_calls_by_sample_gene()
+        and returns the normalized calls as one flat list. Groups for which no call
+        could be determined are left out.
+        """
+        logger.info("Normalizing gene calls for %d samples.", len(grouped_calls))
+        normalize = self.normalize
+        normalized_results = [
+            normalized_call
+            for genes_data in grouped_calls.values()
+            for calls in genes_data.values()
+            if calls and (normalized_call := normalize(calls)) is not None
+        ]
+        logger.info("Normalized %d gene calls.", len(normalized_results))
+        return normalized_results
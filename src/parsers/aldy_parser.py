@@ -1,17 +1,41 @@
-import sys
-import pandas as pd
+import logging
+import functools
 import os
-import json
-import io   # To treat string as a file
 import re   # For regular expressions, to parse solution description
 
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Iterable, Optional, Union
 
 # Import standardized formats
-from src.standard_formats import StandardizedGeneCall, RawToolOutput, VariantReported, RawAlleleComponent
+from src.standard_formats import StandardizedGeneCall, intern_allele, dump_gene_call_json
 # Import the BaseParser for interface adherence
 from src.parsers.base_parser import BaseParser
 
+logger = logging.getLogger(__name__)
+
+# Compiled once at import instead of per parse() call
+_SOLUTION_RE = re.compile(r'^#Solution (\d+): (.*)')      # '#Solution 1: *1.001, *4, *4.021'
+_GENE_PREFIX_RE = re.compile(r'[A-Z][A-Z0-9]*(?=\*)')     # Gene symbol in front of a star allele ('CYP2D6*1' -> '*1')
+_ALLELE_SPLIT_RE = re.compile(r'[/+]')                    # Separators between alleles in a diplotype
+
+
+@functools.lru_cache(maxsize=1024)
+def _reference_genome_of_location(location: str) -> str:
+    """
+    Heuristically infers the reference genome based on variant location.
+    This is a simple guess; more robust solutions might require explicit
+    reference genome input or more complex logic.
+    Cached, since a batch only ever sees a handful of distinct solution locations.
+    """
+    try:
+        loc_int = int(location)
+        # Example: A common range for human chromosomes (e.g., chr22 where CYP2D6 is)
+        # on GRCh37/hg19. This is a very broad and simplistic heuristic.
+        if 1_000_000 <= loc_int <= 250_000_000:
+             return "GRCh37" # Assuming GRCh37 based on typical PharmVar/CYP2D6 data
+    except (ValueError, TypeError):
+        pass # Not an integer location, or location is missing
+    return "UNKNOWN"
+
 
 class AldyParser(BaseParser):
     """
@@ -28,40 +52,177 @@ class AldyParser(BaseParser):
             'AlleleCopyIdentifier', 'Allele', 'Location', 'VariantType',
             'Coverage', 'VariantFunctionalityRaw', 'dbSNP', 'KarolinskaCode', 'VariantStatus'
         ]
-        print(f"Initialized {self.tool_name} Parser.")
+        logger.debug("Initialized %s Parser.", self.tool_name)
 
     def _infer_reference_genome_from_location(self, location: str) -> str:
         """
         Heuristically infers the reference genome based on variant location.
-        This is a simple guess; more robust solutions might require explicit
-        reference genome input or more complex logic.
+        See _reference_genome_of_location(), which caches the result per distinct location.
         """
-        try:
-            loc_int = int(location)
-            # Example: A common range for human chromosomes (e.g., chr22 where CYP2D6 is)
-            # on GRCh37/hg19. This is a very broad and simplistic heuristic.
-            if 1_000_000 <= loc_int <= 250_000_000:
-                 return "GRCh37" # Assuming GRCh37 based on typical PharmVar/CYP2D6 data
-        except (ValueError, TypeError):
-            pass # Not an integer location, or location is missing
-        return "UNKNOWN"
+        return _reference_genome_of_location(location)
 
 
     def _infer_copy_number_from_diplotype(self, diplotype_string: str) -> Optional[Union[int, float]]:
         """
-        Heuristically infers a copy number from a diplotype string.
+        Heuristically infers a copy number from a diplotype string by counting its allele components.
         This is a simplified approach and may not capture all complexities (e.g., Xn/Ym).
+        Example: CYP2D6*1/*4+*4.021 -> *1/*4+*4.021 -> 1, 4, 4.021 (3 copies)
         """
         if not diplotype_string:
             return None
-        # Clean the diplotype string to count distinct allele components
-        # Example: CYP2D6*1/*4+*4.021 -> *1/*4+*4.021 -> 1, 4, 4.021 (3 copies)
-        # Handle various common delimiters and remove gene prefixes
-        cleaned_diplotype = diplotype_string.replace('CYP2D6', '').replace('CYP2C9', '').replace('CYP2C19', '') # TODO: Implement general solution
-        # Split by '/', '+', and filter out empty strings
-        alleles_list = [a.strip() for a in re.split(r'[/\+]', cleaned_diplotype) if a.strip()]
-        return len(alleles_list)
+        cleaned_diplotype = _GENE_PREFIX_RE.sub('', diplotype_string)
+        return sum(1 for allele in _ALLELE_SPLIT_RE.split(cleaned_diplotype) if allele.strip())
+
+    def _build_gene_calls(
+        self,
+        solution_rows: Iterable[tuple],
+        variants_by_solution: Dict[tuple, List[Dict[str, Any]]],
+        alleles_by_solution: Dict[tuple, List[Dict[str, Any]]],
+        filepath: str,
+    ) -> List[StandardizedGeneCall]:
+        """
+        Builds one StandardizedGeneCall per solution from its solution-level fields
+        (Sample, Gene, SolutionID, Location, Major, Minor, copy_number_raw, SolutionDescription,
+        SolutionIDInt) and the variants/allele components bucketed by (Sample, Gene, SolutionID).
+        """
+        input_file = os.path.basename(filepath)
+        return [
+            # Construct the main StandardizedGeneCall dictionary
+            {
+                "sample_id": sample_id,
+                "gene": gene,
+                "tool_name": self.tool_name,
+                # Map ALDY columns to StandardizedGeneCall top-level fields
+                "reference_genome": self._infer_reference_genome_from_location(location or ''),
+                "input_file": input_file,
+                # Construct the RawToolOutput dictionary
+                "raw_tool_output": {
+                    "diplotype_string": diplotype_string, # ALDY's Major column maps to diplotype_string
+                    "copy_number_raw": copy_number,
+                    "comments_raw": description, # The extracted solution description
+                    "variants_reported": tuple(variants_by_solution.get((sample_id, gene, solution_id), ())), # Frozen on emission
+                    "aldy_solution_id": str(solution_id), # Ensure it's a string
+                    "aldy_solution_id_int": solution_id_int,
+                    "aldy_alleles_in_solution_raw_string": minor, # ALDY's Minor column
+                    "aldy_alleles_parsed": tuple(alleles_by_solution.get((sample_id, gene, solution_id), ())),
+                },
+            }
+            for sample_id, gene, solution_id, location, diplotype_string, minor, copy_number, description, solution_id_int
+            in solution_rows
+        ]
+
+    def _parse_lines(self, lines: List[str], filepath: str) -> List[StandardizedGeneCall]:
+        """
+        Parses the lines of an ALDY file in a single pass: data rows are bucketed by
+        (Sample, Gene, SolutionID) as they are read, and each '#Solution' description is matched
+        to the SolutionID of the data rows that follow it. Columns missing from the header
+        read as empty cells.
+
+        Args:
+            lines (List[str]): The stripped, non-empty lines of the ALDY file.
+            filepath (str): Path of the ALDY file, for messages and 'input_file'.
+        """
+        header_position = next((i for i, line in enumerate(lines) if line.startswith('#Sample')), None)
+        if header_position is None:
+            logger.error("Could not find header line starting with '#Sample' in %s", filepath)
+            return []
 
+        column_names = [col.strip() for col in lines[header_position][1:].split('\t')] # Remove '#' and split
+        if not all(col in column_names for col in self.expected_raw_columns):
+            logger.warning("ALDY file '%s' header missing expected columns. Expected: %s, Found: %s",
+                           filepath, self.expected_raw_columns, column_names)
+        n_columns = len(column_names)
+        column = {name: i for i, name in enumerate(column_names)}
+        # A missing column points at the always-empty cell appended to every row below
+        (sample_col, gene_col, solution_col, major_col, minor_col, copy_col, allele_col, location_col,
+         variant_type_col, coverage_col, functionality_col, dbsnp_col, code_col, status_col) = (
+            column.get(name, n_columns) for name in self.expected_raw_columns
+        )
+
+        solution_descriptions: Dict[str, str] = {}
+        current_solution: Optional[tuple] = None # (SolutionID, description) of the current '#Solution' block
+        first_rows: Dict[tuple, List[Optional[str]]] = {}
+        alleles_by_solution: Dict[tuple, List[Dict[str, Any]]] = {}
+        seen_allele_components = set()
+        variants_by_solution: Dict[tuple, List[Dict[str, Any]]] = {}
+        has_data_rows = False
+
+        for position, line in enumerate(lines):
+            if line.startswith('#Solution '):
+                solution_match = _SOLUTION_RE.match(line)
+                if solution_match:
+                    current_solution = solution_match.groups()
+                continue
+            if line.startswith('#Sample'):
+                continue
+            if position < header_position:
+                logger.debug("Data line found before header in %s: %s...", filepath, line[:50])
+                continue
+
+            has_data_rows = True
+            tokens = line.split('\t')
+            # A description belongs to SolutionID X if a data row with that SolutionID follows it
+            # before the next '#Solution' line
+            if current_solution is not None and len(tokens) > 2 and tokens[2] == current_solution[0]:
+                if current_solution[1]:
+                    solution_descriptions[current_solution[0]] = current_solution[1]
+                current_solution = None
+            # Pad or cut to the header's width (plus the empty cell for missing columns); empty cells become None
+            row = [token or None for token in tokens[:n_columns]]
+            row.extend([None] * (n_columns + 1 - len(row)))
+
+            key = (row[sample_col], row[gene_col], row[solution_col])
+            if None in key:
+                continue
+            first_rows.setdefault(key, row)
+
+            allele, copy_id = row[allele_col], row[copy_col]
+            if allele is not None and copy_id is not None and copy_id.isdigit():
+                component = (key, allele, int(copy_id))
+                if component not in seen_allele_components:
+                    seen_allele_components.add(component)
+                    alleles_by_solution.setdefault(key, []).append(
+                        {'raw_allele_name': allele, 'allele_copy_id': component[2]}
+                    )
+
+            if row[location_col] is not None:
+                variant_type = row[variant_type_col]
+                variant_type_parts = variant_type.split('>') if variant_type is not None else []
+                status_flag = row[status_col] or ''
+                tool_flags = status_flag
+                if row[functionality_col] is not None:
+                    tool_flags += '|FUNC:' + row[functionality_col]
+                if row[code_col] is not None:
+                    tool_flags += '|CODE:' + row[code_col]
+                if not status_flag:
+                    tool_flags = tool_flags[1:] # No leading '|' without a status
+                coverage = row[coverage_col]
+                variants_by_solution.setdefault(key, []).append({
+                    "rsid": row[dbsnp_col],
+                    "location": row[location_col],
+                    "ref_allele": intern_allele(variant_type_parts[0].strip()) if variant_type_parts else None,
+                    "alt_allele": intern_allele(variant_type_parts[1].strip()) if len(variant_type_parts) > 1 else None,
+                    "quality_score": int(coverage) if coverage is not None and coverage.isdigit() else None,
+                    "allele_assignment": allele,
+                    "tool_specific_flags": tool_flags or None,
+                })
+
+        if not has_data_rows:
+            logger.warning("No data rows found in %s after header.", filepath)
+            return []
+
+        # Each allele's components are ordered by copy ID (stable, so first occurrences stay first)
+        for components in alleles_by_solution.values():
+            components.sort(key=lambda component: component['allele_copy_id'])
+
+        solution_rows = (
+            (sample_id, gene, solution_id, row[location_col], row[major_col], row[minor_col],
+             self._infer_copy_number_from_diplotype(row[major_col]),
+             solution_descriptions.get(solution_id, "No Description Found"),
+             int(solution_id) if solution_id.isdigit() else None)
+            for (sample_id, gene, solution_id), row in sorted(first_rows.items(), key=lambda item: item[0])
+        )
+        return self._build_gene_calls(solution_rows, variants_by_solution, alleles_by_solution, filepath)
 
     def parse(self, filepath: str) -> List[StandardizedGeneCall]:
         """
@@ -76,188 +237,26 @@ class AldyParser(BaseParser):
                                    in the standardized format. Returns an empty list if parsing fails.
         """
         if not os.path.exists(filepath):
-            print(f"Error: ALDY output file not found at {filepath}")
+            logger.error("ALDY output file not found at %s", filepath)
             return []
 
-        print(f"Parsing ALDY output from: {filepath}")
-        
-        data_lines: List[str] = []
-        column_names: List[str] = []
-        # Maps SolutionID (str) to its descriptive text from the #Solution line
-        solution_descriptions: Dict[str, str] = {}
-        
-        # Temporary variables to link a #Solution line to the first data row's SolutionID
-        current_solution_id_group_from_header: Optional[str] = None
-        current_solution_description_text: Optional[str] = None
+        logger.info("Parsing ALDY output from: %s", filepath)
 
         try:
             with open(filepath, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if not line: # Skip empty lines
-                        continue
-
-                    if line.startswith('#Sample'):
-                        # This is the actual header line with column names
-                        column_names = [col.strip() for col in line[1:].split('\t')] # Remove '#' and split
-                        # Basic validation: Check if parsed columns match our expected
-                        if not all(col in column_names for col in self.expected_raw_columns):
-                            print(f"Warning: ALDY file '{filepath}' header missing expected columns. "
-                                  f"Expected: {self.expected_raw_columns}, Found: {column_names}")
-                        continue # Skip to next line after finding header
-
-                    if line.startswith('#Solution '):
-                        # This line contains the overall solution description
-                        match = re.match(r'#Solution (\d+): (.*)', line)
-                        if match:
-                            current_solution_id_group_from_header = match.group(1) # e.g., '1'
-                            current_solution_description_text = match.group(2)    # e.g., '*1.001, *4, *4.021'
-                        continue # Skip to next line
-
-                    # If it's a data line (i.e., not a comment and we've seen the header)
-                    if column_names: # Ensure we've parsed the header first
-                        data_lines.append(line)
-                        
-                        # If we just read a solution description from a '#' line,
-                        # associate it with the SolutionID found in this first data row of the new solution block.
-                        if current_solution_id_group_from_header and current_solution_description_text:
-                            parts = line.split('\t')
-                            # Assuming SolutionID is the 3rd column (index 2) as per the example format
-                            if len(parts) > 2:
-                                solution_id_from_data_row = parts[2] 
-                                if solution_id_from_data_row == current_solution_id_group_from_header:
-                                    solution_descriptions[solution_id_from_data_row] = current_solution_description_text
-                                    # Reset temporary vars for the next solution block
-                                    current_solution_id_group_from_header = None
-                                    current_solution_description_text = None
-                    else:
-                        print(f"Warning: Data line found before header in {filepath}: {line[:50]}...")
-
-            if not column_names:
-                print(f"Error: Could not find header line starting with '#Sample' in {filepath}")
-                return []
-            if not data_lines:
-                print(f"Warning: No data rows found in {filepath} after header.")
+                lines = [line for line in map(str.strip, f) if line] # Skip empty lines
+            if not lines:
+                logger.warning("ALDY file %s is empty or contains only comments.", filepath)
                 return []
-
-            # Use StringIO to read the collected data lines into a DataFrame
-            # `names=column_names` ensures our cleaned column names are used.
-            df = pd.read_csv(io.StringIO("\n".join(data_lines)), sep='\t', names=column_names, dtype=str)
-
-            # Add the SolutionDescription column by mapping SolutionID
-            df['SolutionDescription'] = df['SolutionID'].map(solution_descriptions)
-            df['SolutionDescription'].fillna("No Description Found", inplace=True) # Fallback for any unmapped
-
-            # --- Now, process the DataFrame to populate StandardizedGeneCall objects ---
-            parsed_gene_calls: List[StandardizedGeneCall] = []
-            
-            # Key step: Group by Sample, Gene, and SolutionID.
-            # Each group corresponds to one StandardizedGeneCall in our output list.
-            grouped_solutions = df.groupby(['Sample', 'Gene', 'SolutionID'])
-
-            for (sample_id, gene, solution_id), group_df in grouped_solutions:
-                # Get the first row of the group to extract common solution-level data
-                first_row = group_df.iloc[0]
-
-                # Map ALDY columns to StandardizedGeneCall top-level fields
-                ref_genome = self._infer_reference_genome_from_location(
-                    first_row.get('Location', '') if pd.notna(first_row.get('Location')) else ''
-                )
-                
-                # --- Prepare data for raw_tool_output ---
-                aldy_diplotype_string = first_row.get('Major', '') # ALDY's Major column maps to diplotype_string
-                estimated_cn = self._infer_copy_number_from_diplotype(aldy_diplotype_string)
-                aldy_alleles_in_solution_raw_string = first_row.get('Minor', '') # ALDY's Minor column
-
-                variants_reported: List[VariantReported] = []
-                aldy_alleles_parsed: List[RawAlleleComponent] = []
-
-                # Iterate through each row within the current solution group to extract variants and allele components
-                for _, row in group_df.iterrows():
-                    # Populate RawAlleleComponent (from 'Allele' and 'AlleleCopyIdentifier')
-                    current_allele = row.get('Allele')
-                    current_allele_copy_id_str = row.get('AlleleCopyIdentifier')
-                    current_allele_copy_id = int(current_allele_copy_id_str) if pd.notna(current_allele_copy_id_str) and current_allele_copy_id_str.isdigit() else None
-
-                    if current_allele and current_allele_copy_id is not None:
-                        # Ensure uniqueness for ald_alleles_parsed to avoid duplicate entries for the same allele copy
-                        if {"raw_allele_name": current_allele, "allele_copy_id": current_allele_copy_id} not in aldy_alleles_parsed:
-                             aldy_alleles_parsed.append({
-                                "raw_allele_name": current_allele,
-                                "allele_copy_id": current_allele_copy_id
-                            })
-
-                    # Populate VariantReported (if location data is present for a row)
-                    if pd.notna(row.get('Location')) and row['Location'] != '':
-                        variant_type_parts = row.get('VariantType', '').split('>')
-                        ref_allele = variant_type_parts[0].strip() if len(variant_type_parts) > 0 else None
-                        alt_allele = variant_type_parts[1].strip() if len(variant_type_parts) > 1 else None
-
-                        # Combine tool-specific flags into a single string for tool_specific_flags
-                        tool_flags = []
-                        if pd.notna(row.get('VariantStatus')): tool_flags.append(row['VariantStatus'])
-                        # NORMAL: variant is associated with the star-allele in the database and is found in the sample
-                        # NOVEL: gene-disrupting (core) variant is NOT associated with the star-allele in the database, but is found in the sample (this indicates that Aldy found a novel major star-allele)
-                        # EXTRA: neutral variant is NOT associated with the star-allele in the database, but is found in the sample (this indicates that Aldy found a novel minor star-allele)
-                        # MISSING: neutral variant is associated with the star-allele in the database, but is NOT found in the sample (this also indicates that Aldy found a novel minor star-allele)
-                        
-                        if pd.notna(row.get('VariantFunctionalityRaw')): tool_flags.append(f"FUNC:{row['VariantFunctionalityRaw']}")
-                        # DISRUPTING for gene-disrupting (core, functional) variants, and
-                        # NEUTRAL for neutral (silent) variants
-                        
-                        if pd.notna(row.get('KarolinskaCode')): tool_flags.append(f"CODE:{row['KarolinskaCode']}")
-                        tool_specific_flags_str = "|".join(tool_flags) if tool_flags else None
-                        
-                        variant_data: VariantReported = {
-                            "rsid": row.get('dbSNP', None) if pd.notna(row.get('dbSNP')) else None,
-                            "location": row.get('Location', None) if pd.notna(row.get('Location')) else None,
-                            "ref_allele": ref_allele,
-                            "alt_allele": alt_allele,
-                            "quality_score": int(row['Coverage']) if pd.notna(row.get('Coverage')) and row['Coverage'].isdigit() else None,
-                            "allele_assignment": row.get('Allele', None) if pd.notna(row.get('Allele')) else None,
-                            "tool_specific_flags": tool_specific_flags_str,
-                            # Other fields like genotype, zygosity, etc., are not directly available in ALDY raw output
-                            # and would be None or inferred later if needed.
-                        }
-                        variants_reported.append(variant_data)
-                
-                # Sort aldy_alleles_parsed by allele_copy_id for consistent output
-                aldy_alleles_parsed.sort(key=lambda x: x['allele_copy_id'] if isinstance(x['allele_copy_id'], int) else float('inf'))
-
-                # Construct the RawToolOutput dictionary
-                raw_output_data: RawToolOutput = {
-                    "diplotype_string": aldy_diplotype_string,
-                    "copy_number_raw": estimated_cn,
-                    "comments_raw": first_row.get('SolutionDescription', None), # The extracted solution description
-                    "variants_reported": variants_reported,
-                    "aldy_solution_id": str(solution_id), # Ensure it's a string
-                    "aldy_alleles_in_solution_raw_string": aldy_alleles_in_solution_raw_string,
-                    "aldy_alleles_parsed": aldy_alleles_parsed,
-                }
-                
-                # Construct the main StandardizedGeneCall dictionary
-                gene_call: StandardizedGeneCall = {
-                    "sample_id": sample_id,
-                    "gene": gene,
-                    "tool_name": self.tool_name,
-                    "reference_genome": ref_genome,
-                    "input_file": os.path.basename(filepath),
-                    "raw_tool_output": raw_output_data
-                }
-                parsed_gene_calls.append(gene_call)
-
-        except pd.errors.EmptyDataError:
-            print(f"Warning: ALDY file {filepath} is empty or contains only comments.")
-            return []
+            return self._parse_lines(lines, filepath)
         except Exception as e:
-            print(f"Error parsing ALDY file {filepath}: {e}")
-            # print(f"Problematic DataFrame head:\n{df.head().to_string() if 'df' in locals() else 'DataFrame not created'}")
+            logger.error("Error parsing ALDY file %s: %s", filepath, e)
             return []
 
-        return parsed_gene_calls
-
 # Example Usage (for testing the parser directly) - unchanged
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
     dummy_aldy_output_content = """#Sample	Gene	SolutionID	Major	Minor	AlleleCopyIdentifier	Allele	Location	VariantType	Coverage	VariantFunctionalityRaw	dbSNP	KarolinskaCode	VariantStatus
 #Solution 1: *1.001, *4, *4.021
 NA10860	CYP2D6	1	CYP2D6*1/*4+*4.021	1.001;4;4.021	0	*1.001				
@@ -280,7 +279,7 @@ NA10860	CYP2D6	2	CYP2D6*4/*4+*139.001	4;139.001;4	2	*139.001	42525000	G>A	25	NEU
     if parsed_results:
         for i, entry in enumerate(parsed_results):
             print(f"\n--- Solution {i+1} ---")
-            print(json.dumps(entry, indent=2))
+            print(dump_gene_call_json(entry, indent=2).decode())
     else:
         print("No data parsed or file is empty.")
 
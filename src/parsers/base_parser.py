@@ -1,5 +1,8 @@
 import abc # Import the Abstract Base Classes module
-from typing import List # For type hinting lists
+import os
+import itertools
+import concurrent.futures
+from typing import List, Optional # For type hinting lists
 
 # Import standardized gene call format
 from src.standard_formats import StandardizedGeneCall
@@ -28,4 +31,31 @@ class BaseParser(abc.ABC):
                                        each representing a gene call from the tool.
                                        Returns an empty list if parsing fails or no data.
         """
-        pass # Abstract methods typically have 'pass' as their body
\ No newline at end of file
+        pass # Abstract methods typically have 'pass' as their body
+
+    def parse_many(self, filepaths: List[str], workers: Optional[int] = None) -> List[StandardizedGeneCall]:
+        """
+        Parses several output files in parallel worker processes and returns all
+        gene calls as one flat list, in the order of the given filepaths.
+
+        Each file is handed to self.parse() in a separate process, so the parser
+        instance must be picklable (concrete parsers only carry 'tool_name').
+
+        Args:
+            filepaths (List[str]): The paths to the input files to be parsed.
+            workers (Optional[int]): Number of worker processes; defaults to os.cpu_count().
+
+        Returns:
+            List[StandardizedGeneCall]: The gene calls of all files, concatenated.
+        """
+        if not filepaths:
+            return []
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(filepaths) == 1:
+            return list(itertools.chain.from_iterable(map(self.parse, filepaths)))
+
+        chunksize = max(1, len(filepaths) // (workers * 4))
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(itertools.chain.from_iterable(
+                executor.map(self.parse, filepaths, chunksize=chunksize)
+            ))
@@ -1,6 +1,16 @@
 # pgx_normalizer/src/standard_formats.py
 
-from typing import List, Dict, Any, Optional, Union, TypedDict
+import functools
+import sys
+import typing
+from types import MappingProxyType
+from typing import List, Dict, Any, Annotated, Callable, Iterable, Iterator, Literal, Mapping, Optional, Tuple, Union
+
+import numpy as np
+from pydantic import ConfigDict, Discriminator, Field, Tag, TypeAdapter, with_config
+from pydantic.json_schema import SkipJsonSchema
+# pydantic only accepts typing_extensions.TypedDict on Python < 3.12
+from typing_extensions import NotRequired, Required, TypedDict
 
 #  Helper TypedDicts for nested structures 
 
@@ -19,10 +29,26 @@ class VariantReported(TypedDict, total=False):
     quality_score: Optional[Union[int, float]] # A numerical score indicating quality or confidence (e.g., coverage depth, Phred score)
     allele_assignment: Optional[str]      # Indicates which specific raw allele/haplotype this variant defines/belongs to
                                           # (e.g., "haplotype1", "*4", "CYP2D6*4")
-    tool_specific_flags: Optional[str]    # Any specific flags, notes, or raw functional annotations for this variant
+    tool_specific_flags: Any              # Optional[str]: Any specific flags, notes, or raw functional annotations for this variant
                                           # directly from the tool's output (e.g., "NORMAL|FUNC:S486T", "DISRUPTING")
 
 
+class VariantsColumnar(TypedDict):
+    """
+    Column-oriented (struct-of-arrays) form of a List[VariantReported], one column per field,
+    for analytical passes over many variants (e.g., all rsids, filtering by quality_score)
+    without walking one dict per variant. Build it with rows_to_columns().
+    """
+    rsid: List[Optional[str]]
+    location: List[Optional[str]]
+    ref_allele: List[Optional[str]]
+    alt_allele: List[Optional[str]]
+    genotype: List[Optional[str]]
+    zygosity: List[Optional[str]]
+    quality_score: np.ndarray               # float64; NaN where no score was reported
+    allele_assignment: List[Optional[str]]
+    tool_specific_flags: List[Optional[str]]
+
 class StructuralVariantRaw(TypedDict, total=False):
     """
     Represents a raw structural variant (e.g., gene deletion, duplication, hybrid gene)
@@ -41,7 +67,7 @@ class RawAlleleComponent(TypedDict):
     This is particularly useful for tools like ALDY that delineate individual "allele copies".
     """
     raw_allele_name: str                 # The allele string as identified by the tool (e.g., "*1", "*4", "CYP2D6*1")
-    allele_copy_id: Optional[Union[int, str]] # An identifier for the specific copy (e.g., 0, 1, 2 for distinct copies, or a string ID)
+    allele_copy_id: Optional[int]        # An identifier for the specific copy (e.g., 0, 1, 2 for distinct copies)
 
 
 class RawToolOutput(TypedDict, total=False):
@@ -50,11 +76,13 @@ class RawToolOutput(TypedDict, total=False):
     that are relevant to the gene call but are not yet mapped to a universally
     standardized field (or might never be, if they are tool-unique).
 
-    By setting `total=False`, all fields within this TypedDict are optional by default.
-    However, the `diplotype_string` is considered REQUIRED by the parser to be present.
+    By setting `total=False`, all fields within this TypedDict are optional by default,
+    except `diplotype_string`, which is marked Required and enforced by validation.
+    Free-form text fields are typed `Any` (their expected shape is noted in the comment) so that
+    validation passes them through unchanged instead of type-checking opaque values.
     """
     # Core Interpretation from the Tool
-    diplotype_string: str # REQUIRED: The primary diplotype call string as reported by the tool
+    diplotype_string: Required[str] # REQUIRED: The primary diplotype call string as reported by the tool
                           # (e.g., "CYP2D6*1/*4", "*1x2/*4"). This is the most fundamental output.
 
     # Haplotype-level Raw Data (if tool distinguishes them) 
@@ -66,19 +94,25 @@ class RawToolOutput(TypedDict, total=False):
     functional_status_raw: Optional[str]        # Tool's direct functional prediction (e.g., "Normal Function", "Decreased Function")
     phenotype_prediction_raw: Optional[str]     # Tool's direct phenotype prediction (e.g., "Normal Metabolizer", "UM")
     confidence_score_raw: Optional[Union[int, float]] # Any overall quality/confidence score for the call from the tool
-    comments_raw: Optional[str]                 # General comments, notes, or supplementary text from the tool's output
+    comments_raw: Any                           # Optional[str]: General comments, notes, or supplementary text from the tool's output
                                                 # (e.g., the "#Solution X:" description from ALDY)
 
     # Detailed Variant and Structural Information 
-    variants_reported: List[VariantReported]     # A list of individual variant calls (SNPs/indels) contributing to the diplotype
-    structural_variants_raw: List[StructuralVariantRaw] # A list of structural variants reported by the tool
+    variants_reported: Tuple[VariantReported, ...]     # Individual variant calls (SNPs/indels) contributing to the diplotype
+    structural_variants_raw: Tuple[StructuralVariantRaw, ...] # Structural variants reported by the tool
+    # Streaming alternative to `variants_reported` for very large outputs: a zero-argument callable
+    # returning a fresh iterator over the variants, so they never have to be held in memory at once.
+    # Read variants through iter_variants_reported(), which handles both forms. Not serialized.
+    variants_reported_iter: SkipJsonSchema[Annotated[Optional[Callable[[], Iterable[VariantReported]]], Field(exclude=True)]]
 
     # Tool-Specific Raw Data (Add as needed for each new parser) 
     # These fields are crucial for capturing unique details from specific tools.
     # Example fields for ALDY parser (as discussed previously):
-    aldy_solution_id: Optional[str]                 # ALDY's internal solution identifier
-    aldy_alleles_in_solution_raw_string: Optional[str] # The raw string from ALDY's 'Minor' column (e.g., "1.001;4;4.021")
-    aldy_alleles_parsed: List[RawAlleleComponent]   # A structured representation of individual alleles and copy IDs from ALDY
+    aldy_solution_id: Any                           # Optional[str]: ALDY's internal solution identifier
+    aldy_solution_id_int: Optional[int]             # The same identifier as an int (None if not numeric), precomputed
+                                                    # by the parser so solution ranking needs no per-comparison int()
+    aldy_alleles_in_solution_raw_string: Any        # Optional[str]: The raw string from ALDY's 'Minor' column (e.g., "1.001;4;4.021")
+    aldy_alleles_parsed: Tuple[RawAlleleComponent, ...] # A structured representation of individual alleles and copy IDs from ALDY
 
     # Example for other hypothetical tools (e.g., Stargazer):
     # stargazer_prediction_method: Optional[str]
@@ -86,6 +120,8 @@ class RawToolOutput(TypedDict, total=False):
     # ... any other fields unique to Stargazer's raw output ...
 
 
+# Serializer settings that keep JSON output entirely inside pydantic-core (NaN/inf become null)
+@with_config(ConfigDict(ser_json_bytes='utf8', ser_json_inf_nan='null'))
 class StandardizedGeneCall(TypedDict):
     """
     The main standardized format for a single pharmacogene call from a single tool for a single sample.
@@ -103,4 +139,323 @@ class StandardizedGeneCall(TypedDict):
 
     # This crucial nested dictionary holds all the raw, tool-specific details.
     # It must always be present, although its contents are flexible.
-    raw_tool_output: RawToolOutput
\ No newline at end of file
+    raw_tool_output: RawToolOutput
+
+    # Normalization Results (absent on parser output; set by GeneCallNormalizer on the selected call)
+    normalized_functional_status: NotRequired[str] # Standardized functional status (e.g., "Normal Function")
+    predicted_phenotype: NotRequired[str]          # Predicted metabolizer phenotype (e.g., "Normal Metabolizer")
+
+
+#  Per-tool specializations 
+# Narrower views of the contract for tools with a parser, holding only the fields that tool
+# populates. Validation dispatches on `tool_name` to these (see validate_gene_call()), so a call
+# is checked against its tool's shape instead of probing every optional field of RawToolOutput.
+
+class AldyRawToolOutput(TypedDict, total=False):
+    """The RawToolOutput fields AldyParser fills (see RawToolOutput for their meaning)."""
+    diplotype_string: Required[str]
+    copy_number_raw: Optional[Union[int, float]]
+    comments_raw: Any
+    variants_reported: Tuple[VariantReported, ...]
+    variants_reported_iter: SkipJsonSchema[Annotated[Optional[Callable[[], Iterable[VariantReported]]], Field(exclude=True)]]
+    aldy_solution_id: Any
+    aldy_solution_id_int: Optional[int]
+    aldy_alleles_in_solution_raw_string: Any
+    aldy_alleles_parsed: Tuple[RawAlleleComponent, ...]
+
+
+@with_config(ConfigDict(ser_json_bytes='utf8', ser_json_inf_nan='null'))
+class AldyGeneCall(TypedDict):
+    """A StandardizedGeneCall produced by AldyParser."""
+    sample_id: str
+    gene: str
+    tool_name: Literal['ALDY']
+    reference_genome: str
+    input_file: Optional[str]
+    raw_tool_output: AldyRawToolOutput
+    normalized_functional_status: NotRequired[str]
+    predicted_phenotype: NotRequired[str]
+
+
+#  Schema introspection helpers 
+
+# All TypedDicts defined in this module, innermost first
+_SCHEMA_TYPES: Tuple[type, ...] = (
+    VariantReported, VariantsColumnar, StructuralVariantRaw, RawAlleleComponent, RawToolOutput,
+    StandardizedGeneCall, AldyRawToolOutput, AldyGeneCall,
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _resolved_hints(typed_dict: type) -> Mapping[str, Any]:
+    """
+    Resolved field types of a TypedDict, as returned by typing.get_type_hints().
+    Memoized per type, since validators and converters look up the same few schemas
+    for every record; the result is read-only because it is shared between callers.
+    """
+    return MappingProxyType(typing.get_type_hints(typed_dict))
+
+
+fields_of = _resolved_hints
+
+_SCHEMA_TYPE_SET = frozenset(_SCHEMA_TYPES)
+
+
+def is_pgx_typeddict(tp: Any) -> bool:
+    """
+    True if `tp` is one of the TypedDicts defined in this module.
+    A single frozenset probe; unlike issubclass() checks it also accepts typing constructs.
+    """
+    try:
+        return tp in _SCHEMA_TYPE_SET
+    except TypeError: # Unhashable annotation objects are never schema types
+        return False
+
+
+@functools.lru_cache(maxsize=None)
+def unwrap_annotated(tp: Any) -> Tuple[Any, Tuple[Any, ...]]:
+    """
+    Splits `Annotated[T, *metadata]` into (T, metadata); any other type is returned as (tp, ()).
+    Memoized, since recursive validation only ever meets the few field types of this module.
+    """
+    if typing.get_origin(tp) is typing.Annotated:
+        base_type, *metadata = typing.get_args(tp)
+        return base_type, tuple(metadata)
+    return tp, ()
+
+# Pre-warm the cache so the first parsed record does not pay for the resolution
+for _schema_type in _SCHEMA_TYPES:
+    fields_of(_schema_type)
+
+
+def iter_variants_reported(raw_tool_output: RawToolOutput) -> Iterator[VariantReported]:
+    """
+    Iterates the variants of a RawToolOutput, from the materialized `variants_reported` tuple
+    if present, otherwise from a fresh iterator of the streaming `variants_reported_iter`.
+    """
+    variants = raw_tool_output.get('variants_reported')
+    if variants is not None:
+        return iter(variants)
+    variants_iter = raw_tool_output.get('variants_reported_iter')
+    return iter(variants_iter()) if variants_iter is not None else iter(())
+
+
+def materialize_variants(gene_call: StandardizedGeneCall) -> StandardizedGeneCall:
+    """
+    Returns `gene_call` with streamed variants (variants_reported_iter) collected into
+    variants_reported, for writers that serialize the call; calls that already carry
+    variants_reported, or no variants at all, are returned as they are. The input is not modified.
+    """
+    raw_tool_output = gene_call['raw_tool_output']
+    if 'variants_reported' in raw_tool_output or 'variants_reported_iter' not in raw_tool_output:
+        return gene_call
+    return {
+        **gene_call,
+        'raw_tool_output': {**raw_tool_output, 'variants_reported': tuple(iter_variants_reported(raw_tool_output))},
+    }
+
+
+def rows_to_columns(variants: Iterable[VariantReported]) -> VariantsColumnar:
+    """
+    Converts a sequence of VariantReported records into a VariantsColumnar in a single pass,
+    appending every field to its column. Fields missing from a record become None (NaN for
+    quality_score), so filters can be written as e.g. np.flatnonzero(columns['quality_score'] > 20).
+    """
+    columns: Dict[str, Any] = {field: [] for field in VariantsColumnar.__annotations__}
+    appenders = [(field, column.append) for field, column in columns.items()]
+    for variant in variants:
+        for field, append in appenders:
+            append(variant.get(field))
+    columns['quality_score'] = np.array(columns['quality_score'], dtype=np.float64) # None -> NaN
+    return columns # type: ignore[return-value]
+
+
+#  Validation 
+# Constructing a TypeAdapter compiles the pydantic-core (Rust) validator for the whole nested
+# schema, which is far more expensive than running it, so each adapter, JSON Schema and compiled
+# validator below is built once, on first use: importing this module (as every parser does)
+# pays for none of them.
+
+@functools.lru_cache(maxsize=None)
+def _gene_call_adapter() -> TypeAdapter:
+    """TypeAdapter of the generic StandardizedGeneCall, used for serialization and the JSON Schema."""
+    return TypeAdapter(StandardizedGeneCall)
+
+
+# The keys every RawToolOutput must carry despite total=False (i.e. diplotype_string)
+REQUIRED_RAW_KEYS = RawToolOutput.__required_keys__
+
+
+def assert_raw_tool_output_shape(raw_tool_output: Mapping[str, Any]) -> None:
+    """
+    O(1) presence check for REQUIRED_RAW_KEYS, run by validate_gene_call() on dict input before
+    the full validator, so malformed parser output is rejected without paying for a schema walk.
+    The schema itself enforces the same keys, so JSON input is covered by validate_json().
+    Raises ValueError naming the missing keys.
+    """
+    missing = REQUIRED_RAW_KEYS - raw_tool_output.keys()
+    if missing:
+        raise ValueError(f"RawToolOutput missing required keys: {sorted(missing)}")
+
+# Tools with a specialized schema; any other tool_name is validated against the generic contract
+_TOOL_GENE_CALL_TYPES: Mapping[str, type] = MappingProxyType({'ALDY': AldyGeneCall})
+
+
+def _gene_call_tag(gene_call: Any) -> Optional[str]:
+    """Discriminator for _tool_gene_call_adapter(): the call's tool_name if it has a specialized schema."""
+    if not isinstance(gene_call, dict):
+        return None
+    tool_name = gene_call.get('tool_name')
+    return tool_name if tool_name in _TOOL_GENE_CALL_TYPES else 'generic'
+
+
+@functools.lru_cache(maxsize=None)
+def _tool_gene_call_adapter() -> TypeAdapter:
+    """Tagged union over the per-tool schemas: pydantic-core picks the member by tag in O(1)."""
+    return TypeAdapter(Annotated[
+        Union[
+            tuple(Annotated[call_type, Tag(tool_name)] for tool_name, call_type in _TOOL_GENE_CALL_TYPES.items())
+            + (Annotated[StandardizedGeneCall, Tag('generic')],)
+        ],
+        Discriminator(_gene_call_tag),
+    ])
+
+
+def validate_gene_call(raw: Union[bytes, str, Dict[str, Any]]) -> StandardizedGeneCall:
+    """
+    Validates a StandardizedGeneCall against the schema of its tool (e.g. AldyGeneCall for
+    tool_name "ALDY", the generic contract otherwise) and returns the validated dict.
+    JSON input (bytes or str) is parsed inside pydantic-core, skipping the json.loads() round-trip;
+    dicts are validated as they are, after assert_raw_tool_output_shape() on their raw_tool_output.
+    Keys that are not part of the schema are dropped.
+    Raises pydantic.ValidationError if a required field (including raw_tool_output's diplotype_string)
+    is missing or has the wrong type; dicts lacking diplotype_string fail early with a plain ValueError.
+    """
+    adapter = _tool_gene_call_adapter()
+    if isinstance(raw, (bytes, bytearray, str)):
+        return adapter.validate_json(raw)
+    raw_tool_output = raw.get('raw_tool_output')
+    if isinstance(raw_tool_output, Mapping):
+        assert_raw_tool_output_shape(raw_tool_output)
+    return adapter.validate_python(raw)
+
+
+def dump_gene_call_json(gene_call: StandardizedGeneCall, indent: Optional[int] = None) -> bytes:
+    """
+    Serializes a StandardizedGeneCall to UTF-8 JSON with pydantic-core's Rust serializer,
+    walking the nested call without going through the interpreter as json.dumps() does.
+    Only fields of the schema are written; streamed variants are written as variants_reported
+    (see materialize_variants()).
+    """
+    return _gene_call_adapter().dump_json(materialize_variants(gene_call), indent=indent)
+
+
+# JSON Schema of the contract, generated from the TypedDicts, for downstream consumers and for
+# validating raw tool JSON with validators compiled by fastjsonschema. The returned dicts are
+# shared between callers and must not be modified.
+
+@functools.lru_cache(maxsize=None)
+def gene_call_json_schema() -> Dict[str, Any]:
+    """JSON Schema of StandardizedGeneCall."""
+    return _gene_call_adapter().json_schema()
+
+
+@functools.lru_cache(maxsize=None)
+def variant_json_schema() -> Dict[str, Any]:
+    """JSON Schema of VariantReported."""
+    return TypeAdapter(VariantReported).json_schema()
+
+
+@functools.lru_cache(maxsize=None)
+def _gene_call_validator() -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    import fastjsonschema
+    return fastjsonschema.compile(gene_call_json_schema())
+
+
+@functools.lru_cache(maxsize=None)
+def _variant_validator() -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+    import fastjsonschema
+    return fastjsonschema.compile(variant_json_schema())
+
+
+def validate_raw(gene_call: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Checks already-decoded JSON data against gene_call_json_schema() and returns it unchanged.
+    Raises fastjsonschema.JsonSchemaValueException on the first violation.
+    """
+    return _gene_call_validator()(gene_call)
+
+
+def validate_variant_raw(variant: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    validate_raw() for a single VariantReported, for streaming variant rows without walking
+    the outer gene-call schema for each one.
+    """
+    return _variant_validator()(variant)
+
+#  String interning for ref/alt alleles 
+# Ref/alt alleles take values from a small set; interning makes all variants share one str object
+# per allele (less memory, and equality checks short-circuit on identity).
+
+_BASES: Dict[str, str] = {base: sys.intern(base) for base in 'ACGTN'}
+
+
+def intern_allele(allele: Optional[str]) -> Optional[str]:
+    """Canonical str for a ref/alt allele: single bases come from a pre-interned table."""
+    if allele is None:
+        return None
+    return _BASES.get(allele) or sys.intern(allele)
+
+
+#  Frozen key sets 
+# Snapshots of each schema's field names, for O(1) "is this a standardized key?" checks
+# (e.g. separating tool-specific extras) without re-reading __annotations__ per record.
+
+VARIANT_REPORTED_KEYS = frozenset(VariantReported.__annotations__)
+STRUCTURAL_VARIANT_RAW_KEYS = frozenset(StructuralVariantRaw.__annotations__)
+RAW_ALLELE_COMPONENT_KEYS = frozenset(RawAlleleComponent.__annotations__)
+RAW_TOOL_OUTPUT_KEYS = frozenset(RawToolOutput.__annotations__)
+STANDARDIZED_GENE_CALL_KEYS = frozenset(StandardizedGeneCall.__annotations__)
+
+
+#  Packed allele components 
+# A solution's RawAlleleComponents dictionary-encoded as one int64 each: the index of the allele
+# name in a table of the solution's distinct names in the high 32 bits, the copy id in the low
+# 32 bits (all ones for no copy id). Built on demand from aldy_alleles_parsed, e.g. for NumPy
+# set/sort operations over the components; the packed form is never stored in a gene call.
+
+_NO_COPY_ID = 0xFFFFFFFF
+
+
+def _packed_copy_id(allele_copy_id: Optional[int]) -> int:
+    """The low 32 bits of a packed component; ids that would wrap or hit _NO_COPY_ID are rejected."""
+    if allele_copy_id is None:
+        return _NO_COPY_ID
+    if not 0 <= allele_copy_id < _NO_COPY_ID:
+        raise ValueError(f"allele_copy_id {allele_copy_id} cannot be packed, expected 0 <= id < {_NO_COPY_ID:#x}")
+    return allele_copy_id
+
+
+def pack_allele_components(components: Iterable[RawAlleleComponent]) -> Tuple[np.ndarray, Tuple[str, ...]]:
+    """
+    Packs RawAlleleComponents (e.g. raw_tool_output['aldy_alleles_parsed']) into an int64 array.
+    Returns the array and the allele-name table its high 32 bits index into.
+    Raises ValueError for a copy id outside 0 <= id < 0xFFFFFFFF.
+    """
+    allele_ids: Dict[str, int] = {}
+    packed = np.fromiter(
+        ((allele_ids.setdefault(component['raw_allele_name'], len(allele_ids)) << 32)
+         | _packed_copy_id(component['allele_copy_id'])
+         for component in components),
+        dtype=np.int64,
+    )
+    return packed, tuple(allele_ids)
+
+
+def unpack_allele_components(packed: np.ndarray, allele_names: Tuple[str, ...]) -> List[RawAlleleComponent]:
+    """Inverse of pack_allele_components(): rebuilds the RawAlleleComponent dicts."""
+    packed = np.asarray(packed, dtype=np.int64)
+    return [
+        {'raw_allele_name': allele_names[allele], 'allele_copy_id': None if copy_id == _NO_COPY_ID else copy_id}
+        for allele, copy_id in zip((packed >> 32).tolist(), (packed & 0xFFFFFFFF).tolist())
+    ]
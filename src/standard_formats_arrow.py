@@ -0,0 +1,107 @@
+# pgx_normalizer/src/standard_formats_arrow.py
+
+import itertools
+import types
+import typing
+from typing import Any, Dict, Iterable, Iterator, Literal, Union
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pydantic.json_schema import SkipJsonSchema
+from typing_extensions import NotRequired, Required
+
+from src.standard_formats import (
+    StandardizedGeneCall, StructuralVariantRaw, VariantReported,
+    is_pgx_typeddict, materialize_variants, unwrap_annotated,
+)
+
+#  Arrow schemas derived from the TypedDicts in standard_formats.py
+# For shipping many gene calls between stages as columnar Arrow tables / Parquet files instead
+# of row-major dicts. Every field is nullable, mirroring the optional fields of the TypedDicts.
+# Fields that are never serialized (SkipJsonSchema, e.g. variants_reported_iter) have no column.
+# Free-form `Any` fields are stored as strings, the shape their comments document.
+
+# Leaf Python types; ints are 64-bit to hold any Python int a parser emits
+_ARROW_LEAF_TYPES: Dict[Any, pa.DataType] = {
+    str: pa.string(),
+    int: pa.int64(),
+    float: pa.float64(),
+    bool: pa.bool_(),
+    Any: pa.string(),
+}
+
+# Gene calls per Parquet row group; ~64K rows keeps the nested variant columns of a group in the MB range
+PARQUET_ROW_GROUP_SIZE = 65_536
+
+
+def _is_serialized(tp: Any) -> bool:
+    """False for fields excluded from serialization via SkipJsonSchema."""
+    return not any(isinstance(meta, SkipJsonSchema) for meta in unwrap_annotated(tp)[1])
+
+
+def _arrow_type_for(tp: Any) -> pa.DataType:
+    """Maps a field annotation of the schema TypedDicts to an Arrow type."""
+    tp = unwrap_annotated(tp)[0]
+    origin = typing.get_origin(tp)
+    if origin in (Required, NotRequired):
+        return _arrow_type_for(typing.get_args(tp)[0])
+    if origin in (Union, types.UnionType): # Optional[X]: Arrow fields are nullable anyway
+        members = [arg for arg in typing.get_args(tp) if arg is not type(None)]
+        if len(members) == 1:
+            return _arrow_type_for(members[0])
+        if set(members) == {int, float}: # Numeric scores: one float64 column (15 reads back as 15.0)
+            return pa.float64()
+    elif origin in (list, tuple): # List[X] / Tuple[X, ...]
+        return pa.list_(_arrow_type_for(typing.get_args(tp)[0]))
+    elif origin is Literal:
+        return _arrow_type_for(type(typing.get_args(tp)[0]))
+    elif is_pgx_typeddict(tp):
+        return pa.struct(list(arrow_schema_for(tp)))
+    elif tp in _ARROW_LEAF_TYPES:
+        return _ARROW_LEAF_TYPES[tp]
+    raise TypeError(f"No Arrow type for annotation {tp!r}")
+
+
+def arrow_schema_for(typed_dict: type) -> pa.Schema:
+    """
+    Derives an Arrow schema from a TypedDict of standard_formats.py, one nullable field per
+    serialized key in declaration order; nested TypedDicts become structs, sequences lists.
+    """
+    hints = typing.get_type_hints(typed_dict, include_extras=True)
+    return pa.schema([
+        pa.field(name, _arrow_type_for(tp), nullable=True)
+        for name, tp in hints.items()
+        if _is_serialized(tp)
+    ])
+
+
+# Built once at import
+VARIANT_REPORTED_SCHEMA: pa.Schema = arrow_schema_for(VariantReported)
+STRUCTURAL_VARIANT_RAW_SCHEMA: pa.Schema = arrow_schema_for(StructuralVariantRaw)
+GENE_CALL_SCHEMA: pa.Schema = arrow_schema_for(StandardizedGeneCall)
+
+
+def gene_calls_to_table(gene_calls: Iterable[StandardizedGeneCall]) -> pa.Table:
+    """Converts StandardizedGeneCall dicts to an Arrow table with GENE_CALL_SCHEMA."""
+    return pa.Table.from_pylist([materialize_variants(gene_call) for gene_call in gene_calls], schema=GENE_CALL_SCHEMA)
+
+
+def write_parquet(path: str, gene_calls: Iterable[StandardizedGeneCall],
+                  row_group_size: int = PARQUET_ROW_GROUP_SIZE) -> None:
+    """
+    Writes StandardizedGeneCalls to a Parquet file with GENE_CALL_SCHEMA, converting and writing
+    `row_group_size` calls at a time so the full batch never has to exist as one Arrow table.
+    """
+    gene_calls = iter(gene_calls)
+    with pq.ParquetWriter(path, GENE_CALL_SCHEMA) as writer:
+        while chunk := list(itertools.islice(gene_calls, row_group_size)):
+            writer.write_table(gene_calls_to_table(chunk), row_group_size=row_group_size)
+
+
+def iter_parquet(path: str, batch_size: int = PARQUET_ROW_GROUP_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Reads back a file written by write_parquet() as gene-call dicts, batch by batch. Every schema
+    field is present (None where unset) and sequences come back as lists.
+    """
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        yield from batch.to_pylist()
@@ -0,0 +1,106 @@
+# pgx_normalizer/src/standard_formats_msgspec.py
+
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+try:
+    import msgspec
+except ImportError:  # msgspec is optional; without it this module only exports HAVE_MSGSPEC = False
+    msgspec = None
+
+#  Optional msgspec.Struct mirrors of the TypedDicts in standard_formats.py
+# msgspec decodes JSON straight into these slotted Structs in one C pass, with no intermediate
+# dicts, which makes it the fastest way to read large JSONL batches of gene calls (one
+# StandardizedGeneCall per line). The TypedDicts remain the public contract: fields mirror
+# them one-to-one (variants_reported_iter is left out, it is never serialized), and
+# gene_call_to_dict() converts a Struct back to the TypedDict form.
+
+HAVE_MSGSPEC: bool = msgspec is not None
+
+if HAVE_MSGSPEC:
+
+    class VariantReportedM(msgspec.Struct, omit_defaults=True):
+        """msgspec mirror of VariantReported."""
+        rsid: Optional[str] = None
+        location: Optional[str] = None
+        ref_allele: Optional[str] = None
+        alt_allele: Optional[str] = None
+        genotype: Optional[str] = None
+        zygosity: Optional[str] = None
+        quality_score: Optional[Union[int, float]] = None
+        allele_assignment: Optional[str] = None
+        tool_specific_flags: Any = None
+
+
+    class StructuralVariantRawM(msgspec.Struct, omit_defaults=True):
+        """msgspec mirror of StructuralVariantRaw."""
+        type: Optional[str] = None
+        description: Optional[str] = None
+        location: Optional[str] = None
+        tool_specific_id: Optional[str] = None
+
+
+    class RawAlleleComponentM(msgspec.Struct):
+        """msgspec mirror of RawAlleleComponent."""
+        raw_allele_name: str
+        allele_copy_id: Optional[int]
+
+
+    class RawToolOutputM(msgspec.Struct, omit_defaults=True):
+        """msgspec mirror of RawToolOutput (without variants_reported_iter)."""
+        diplotype_string: str
+        haplotype1_raw: Optional[str] = None
+        haplotype2_raw: Optional[str] = None
+        copy_number_raw: Optional[Union[int, float]] = None
+        functional_status_raw: Optional[str] = None
+        phenotype_prediction_raw: Optional[str] = None
+        confidence_score_raw: Optional[Union[int, float]] = None
+        comments_raw: Any = None
+        variants_reported: Optional[Tuple[VariantReportedM, ...]] = None
+        structural_variants_raw: Optional[Tuple[StructuralVariantRawM, ...]] = None
+        aldy_solution_id: Any = None
+        aldy_solution_id_int: Optional[int] = None
+        aldy_alleles_in_solution_raw_string: Any = None
+        aldy_alleles_parsed: Optional[Tuple[RawAlleleComponentM, ...]] = None
+
+
+    class StandardizedGeneCallM(msgspec.Struct, omit_defaults=True):
+        """msgspec mirror of StandardizedGeneCall."""
+        sample_id: str
+        gene: str
+        tool_name: str
+        reference_genome: str
+        input_file: Optional[str]
+        raw_tool_output: RawToolOutputM
+        normalized_functional_status: Optional[str] = None
+        predicted_phenotype: Optional[str] = None
+
+
+    # Built once: a Decoder/Encoder caches its type-specific state on construction
+    _DEC = msgspec.json.Decoder(StandardizedGeneCallM)
+    _ENC = msgspec.json.Encoder()
+
+
+    def decode_gene_call(data: Union[bytes, str]) -> 'StandardizedGeneCallM':
+        """
+        Decodes one JSON-serialized StandardizedGeneCall (e.g. a JSONL line) into its Struct mirror.
+        Raises msgspec.ValidationError if a required field is missing or has the wrong type.
+        """
+        return _DEC.decode(data)
+
+
+    def iter_gene_calls_jsonl(lines: Iterable[Union[bytes, str]]) -> Iterator['StandardizedGeneCallM']:
+        """Decodes a JSONL stream of StandardizedGeneCalls lazily, skipping blank lines."""
+        decode = _DEC.decode
+        for line in lines:
+            if line.strip():
+                yield decode(line)
+
+
+    def encode_gene_call(gene_call: 'StandardizedGeneCallM') -> bytes:
+        """Serializes a Struct mirror to compact JSON; unset optional fields are omitted."""
+        return _ENC.encode(gene_call)
+
+
+    def gene_call_to_dict(gene_call: 'StandardizedGeneCallM') -> Dict[str, Any]:
+        """Converts a Struct mirror back to the StandardizedGeneCall TypedDict form."""
+        return msgspec.to_builtins(gene_call)
@@ -0,0 +1,66 @@
+# pgx_normalizer/src/standard_formats_slots.py
+
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+#  __slots__ mirrors of the record-like TypedDicts in standard_formats.py 
+# Consumers that hold many variants in memory for a long time can convert them to frozen
+# slotted dataclasses: ~4x less memory per record and a slot load instead of a dict probe per
+# field access. The TypedDicts remain the public contract: parsers emit dicts, and validators
+# and serializers only accept dicts, so convert back with to_dict() before handing records on.
+
+
+class _SlotsRecord:
+    """
+    Shared adapters for the mirrors below. get() mimics dict.get() so code that reads
+    the TypedDict form (e.g. variant.get('tool_specific_flags')) works on both.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_typed_dict(cls, record: Dict[str, Any]):
+        """Builds the mirror from its TypedDict form; missing keys take the field default."""
+        return cls(**record)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the TypedDict form with every field present (unset fields as None)."""
+        return {field.name: getattr(self, field.name) for field in fields(self)}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+
+@dataclass(slots=True, frozen=True)
+class VariantReportedS(_SlotsRecord):
+    """__slots__ mirror of VariantReported."""
+    rsid: Optional[str] = None
+    location: Optional[str] = None
+    ref_allele: Optional[str] = None
+    alt_allele: Optional[str] = None
+    genotype: Optional[str] = None
+    zygosity: Optional[str] = None
+    quality_score: Optional[Union[int, float]] = None
+    allele_assignment: Optional[str] = None
+    tool_specific_flags: Optional[str] = None
+
+
+@dataclass(slots=True, frozen=True)
+class StructuralVariantRawS(_SlotsRecord):
+    """__slots__ mirror of StructuralVariantRaw."""
+    type: Optional[str] = None
+    description: Optional[str] = None
+    location: Optional[str] = None
+    tool_specific_id: Optional[str] = None
+
+
+@dataclass(slots=True, frozen=True)
+class RawAlleleComponentS(_SlotsRecord):
+    """__slots__ mirror of RawAlleleComponent."""
+    raw_allele_name: str
+    allele_copy_id: Optional[int] = None
+
+
+def to_slots_records(records: Iterable[Dict[str, Any]], mirror: type) -> List[_SlotsRecord]:
+    """Converts TypedDict records (e.g. a solution's variants) to their slotted mirror."""
+    from_typed_dict = mirror.from_typed_dict
+    return [from_typed_dict(record) for record in records]
@@ -0,0 +1,163 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
+import pytest
+
+from src.data.load_pharmvar import _bounded_map, load_and_process_gene_pharmvar
+from src.data.pharmvar_manager import PharmVarManager
+
+FIXTURE_TSV = os.path.join(os.path.dirname(__file__), "data", "CYP2D6.haplotypes.tsv")
+
+HAPLOTYPES_HEADER = (
+    "Haplotype Name\tGene\trsID\tReferenceSequence\tVariant Start\tVariant Stop"
+    "\tReference Allele\tVariant Allele\tType"
+)
+
+
+def variant_row(allele, rsid, start):
+    return f"CYP2D6{allele}\tCYP2D6\t{rsid}\tNC_000022.10\t{start}\t{start}\tC\tT\tsubstitution"
+
+
+def reference_row(allele):
+    return f"CYP2D6{allele}\tCYP2D6\tREFERENCE\t\t\t\t\t\t"
+
+
+def test_variant_details_stay_with_their_allele(tmp_path):
+    # 120 alleles whose rows interleave over four passes; every third allele restarts at a REFERENCE row,
+    # which replaces the variants collected before it but is itself listed first
+    alleles = [f"*{i}" for i in range(1, 121)]
+    restarted = alleles[2::3]
+    lines = ["# PharmVar haplotypes", HAPLOTYPES_HEADER]
+    lines += [variant_row(allele, f"rs{i}01", 1000 + i) for i, allele in enumerate(alleles, 1)]
+    lines += [
+        reference_row(allele) if allele in restarted else variant_row(allele, f"rs{i}02", 2000 + i)
+        for i, allele in enumerate(alleles, 1)
+    ]
+    lines += [variant_row(allele, f"rs{i}03", 3000 + i) for i, allele in enumerate(alleles, 1)]
+    lines += [variant_row(allele, f"rs{i}04", 4000 + i) for i, allele in enumerate(alleles, 1) if allele in restarted]
+    assert len(lines) - 2 > 100
+    path = tmp_path / "CYP2D6.haplotypes.tsv"
+    path.write_text("\n".join(lines) + "\n")
+
+    definitions = load_and_process_gene_pharmvar("CYP2D6", str(path))["definitions"]
+
+    assert [key for key, value in definitions.items() if "maps_to" not in value] == alleles
+    for i, allele in enumerate(alleles, 1):
+        definition = definitions[allele]
+        rsids = [variant["rsID"] for variant in definition["variant_details"]]
+        if allele in restarted:
+            assert rsids == ["REFERENCE", f"rs{i}03", f"rs{i}04"]
+            assert definition["is_primary_definition"] is True
+        else:
+            assert rsids == [f"rs{i}01", f"rs{i}02", f"rs{i}03"]
+            assert "is_primary_definition" not in definition
+        assert definitions[f"CYP2D6{allele}"] == {"maps_to": allele}
+
+
+def details(rsid, start, stop, ref, alt, variant_type, reference_sequence="NC_000022.10"):
+    return {
+        "rsID": rsid, "reference_sequence": reference_sequence, "variant_start": start, "variant_stop": stop,
+        "reference_allele": ref, "variant_allele": alt, "type": variant_type,
+    }
+
+
+REFERENCE = details("REFERENCE", "", "", "", "", "", reference_sequence="")
+RS3892097 = details("rs3892097", "42524947", "42524947", "C", "T", "substitution")
+
+
+@pytest.fixture
+def gene_data():
+    return load_and_process_gene_pharmvar("CYP2D6", FIXTURE_TSV)
+
+
+def test_fixture_definitions(gene_data):
+    assert gene_data == {"definitions": {
+        "*1": {"raw_pharmvar_name": "CYP2D6*1", "variant_details": [REFERENCE], "is_primary_definition": True},
+        "*2": {"raw_pharmvar_name": "CYP2D6*2", "variant_details": [
+            details("rs16947", "42523943", "42523943", "G", "A", "substitution"),
+            details("rs1135840", "42522613", "42522613", "G", "C", "substitution"),
+            details("", "42525810", "42525811", "TG", "T", "deletion"),
+        ]},
+        # *4 restarts at each REFERENCE row, so only its last one and the variant after it remain
+        "*4": {"raw_pharmvar_name": "CYP2D6*4", "variant_details": [REFERENCE, RS3892097], "is_primary_definition": True},
+        "*4.001": {"raw_pharmvar_name": "CYP2D6*4.001", "variant_details": [RS3892097]},
+        "*10": {"raw_pharmvar_name": "*10", "variant_details": [
+            details("rs1065852", "42526694", "42526694", "G", "A", "substitution"),
+        ]},
+        # The row without a Haplotype Name is skipped, and '*10' is already a definition key
+        "CYP2D6*1": {"maps_to": "*1"},
+        "CYP2D6*2": {"maps_to": "*2"},
+        "CYP2D6*4": {"maps_to": "*4"},
+        "CYP2D6*4.001": {"maps_to": "*4.001"},
+        "CYP2D6*10": {"maps_to": "*10"},
+    }}
+    assert list(gene_data["definitions"])[:5] == ["*1", "*2", "*4", "*4.001", "*10"]
+
+
+def test_fixture_pools_repeated_strings(gene_data):
+    variants = [
+        variant
+        for definition in gene_data["definitions"].values()
+        for variant in definition.get("variant_details", [])
+        if variant["rsID"] != "REFERENCE"
+    ]
+    for key in ("rsID", "reference_sequence", "type"):
+        pooled = {}
+        for variant in variants:
+            assert pooled.setdefault(variant[key], variant[key]) is variant[key]
+    rs3892097 = [variant["rsID"] for variant in variants if variant["rsID"] == "rs3892097"]
+    assert len(rs3892097) == 2 and rs3892097[0] is rs3892097[1]
+
+
+def test_missing_tsv_returns_none(tmp_path):
+    assert load_and_process_gene_pharmvar("CYP2D6", str(tmp_path / "missing.tsv")) is None
+
+
+@pytest.fixture
+def manager(tmp_path, gene_data):
+    path = tmp_path / "pharmvar_processed.json"
+    path.write_bytes(orjson.dumps({"metadata": {}, "genes": {"CYP2D6": gene_data}}))
+    return PharmVarManager(str(path))
+
+
+@pytest.mark.parametrize("raw_allele, expected", [
+    ("*4", "*4"),
+    ("CYP2D6*4", "*4"),
+    ("4", "*4"),
+    ("CYP2D6*4.001", "*4.001"),
+    ("4.001", "*4.001"),
+    ("*10", "*10"),
+    ("CYP2D6*10", "*10"),
+    ("CYP2D6 * 2", "*2"),
+    ("*99", "UNKNOWN"),
+    ("", "UNKNOWN"),
+])
+def test_manager_normalizes_fixture_alleles(manager, raw_allele, expected):
+    assert manager.get_normalized_allele("CYP2D6", raw_allele) == expected
+
+
+def test_manager_lookups(manager, gene_data):
+    assert manager.supported_genes == ["CYP2D6"]
+    assert manager.get_gene_info("CYP2D6") == gene_data
+    assert manager.get_gene_info("TPMT") is None
+    assert manager.get_allele_functionality("CYP2D6", "*4") == "No Function"
+    assert manager.get_allele_functionality("CYP2D6", "*4.001") == "Unknown"
+    assert manager.get_standard_phenotype(manager.get_allele_functionality("CYP2D6", "*10")) == "IM"
+
+
+def test_bounded_map_keeps_order_and_bounds_submissions():
+    consumed, in_flight = [], []
+
+    def items():
+        for item in range(20):
+            # Every item pulled before this one has been submitted; those not yet consumed are in flight
+            in_flight.append(item - len(consumed))
+            yield item
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        for result in _bounded_map(executor, lambda item: item * 10, items(), max_in_flight=3):
+            consumed.append(result)
+
+    assert consumed == [item * 10 for item in range(20)]
+    assert max(in_flight) == 3
@@ -0,0 +1,86 @@
+from src.normalizer.gene_call_normalizer import (
+    GeneCallNormalizer, ParsedBatch, group_gene_calls_by_sample_gene,
+)
+
+
+def gene_call(sample_id, gene, solution_id, status=None, tool_name="ALDY"):
+    variants = () if status is None else ({"tool_specific_flags": f"{status}|CODE:C1"},)
+    return {
+        "sample_id": sample_id,
+        "gene": gene,
+        "tool_name": tool_name,
+        "reference_genome": "GRCh37",
+        "input_file": "aldy.tsv",
+        "raw_tool_output": {
+            "diplotype_string": f"{gene}*{solution_id}",
+            "aldy_solution_id": str(solution_id),
+            "aldy_solution_id_int": solution_id,
+            "variants_reported": variants,
+        },
+    }
+
+
+def make_calls():
+    # Fresh dicts on every call: normalization annotates the selected calls in place
+    return [
+        gene_call("S1", "CYP2D6", 2, "NORMAL"),
+        gene_call("S1", "CYP2D6", 1, "NOVEL"),
+        gene_call("S1", "CYP2D6", 3, "NORMAL"),
+        gene_call("S2", "CYP2C19", 1),
+        gene_call("S1", "CYP2C19", 2),
+        gene_call("S1", "CYP2C19", 1),
+        gene_call("S2", "CYP2D6", 1, "NORMAL", tool_name="OTHER"),
+        gene_call("S2", "CYP2C19", 1, "NORMAL"),
+        gene_call(None, "CYP2D6", 1, "NORMAL"),
+    ]
+
+
+def selection(calls):
+    return [(call["sample_id"], call["gene"], call["raw_tool_output"]["aldy_solution_id_int"]) for call in calls]
+
+
+def test_normalize_prefers_lowest_normal_solution():
+    best = GeneCallNormalizer().normalize(make_calls()[:3])
+    assert best["raw_tool_output"]["aldy_solution_id_int"] == 2
+    assert best["predicted_phenotype"] == "Normal Metabolizer (Inferred)"
+
+
+def test_normalize_without_normal_solution_takes_lowest_id():
+    best = GeneCallNormalizer().normalize(make_calls()[4:6])
+    assert selection([best]) == [("S1", "CYP2C19", 1)]
+
+
+def test_normalize_rejects_empty_or_mixed_input():
+    normalizer = GeneCallNormalizer()
+    assert normalizer.normalize([]) is None
+    assert normalizer.normalize(make_calls()[2:4]) is None
+
+
+def test_normalize_paths_agree():
+    normalizer = GeneCallNormalizer()
+    per_group = [
+        normalizer.normalize(group)
+        for genes in group_gene_calls_by_sample_gene(make_calls()).values()
+        for group in genes.values()
+    ]
+    grouped = normalizer.normalize_grouped(group_gene_calls_by_sample_gene(make_calls()))
+    batched = normalizer.normalize_batch(make_calls())
+
+    assert selection(per_group) == [
+        ("S1", "CYP2D6", 2), ("S1", "CYP2C19", 1), ("S2", "CYP2C19", 1), ("S2", "CYP2D6", 1),
+    ]
+    assert selection(grouped) == selection(per_group)
+    assert batched == grouped
+
+
+def test_normalize_batch_empty():
+    assert GeneCallNormalizer().normalize_batch([]) == []
+
+
+def test_parsed_batch_matches_list_input():
+    normalizer = GeneCallNormalizer()
+    calls = make_calls()
+    batch = ParsedBatch.from_calls(calls)
+    assert len(batch) == 8
+    assert batch.to_list_of_dicts() == calls[:-1]
+    assert normalizer.normalize_batch(batch) == normalizer.normalize_batch(make_calls())
@@ -0,0 +1,98 @@
+import pytest
+
+from src.parsers.aldy_parser import AldyParser
+
+ALDY_HEADER = (
+    "#Sample\tGene\tSolutionID\tMajor\tMinor\tAlleleCopyIdentifier\tAllele\tLocation\tVariantType"
+    "\tCoverage\tVariantFunctionalityRaw\tdbSNP\tKarolinskaCode\tVariantStatus"
+)
+
+
+def write_aldy(tmp_path, *lines, name="aldy.tsv"):
+    path = tmp_path / name
+    path.write_text("\n".join((ALDY_HEADER,) + lines) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def parse():
+    return AldyParser().parse
+
+
+def test_indel_only_file(tmp_path, parse):
+    # No VariantType contains '>', so there is no alt allele column to split out
+    path = write_aldy(
+        tmp_path,
+        "#Solution 1: *1, *1",
+        "NA10860\tCYP2D6\t1\tCYP2D6*1/*1\t1;1\t0\t*1\t42522612\tdelC\t15\t\trs5030655\t\tNORMAL",
+    )
+    calls = parse(path)
+    assert len(calls) == 1
+    variant, = calls[0]["raw_tool_output"]["variants_reported"]
+    assert variant["ref_allele"] == "delC"
+    assert variant["alt_allele"] is None
+    assert variant["rsid"] == "rs5030655"
+
+
+def test_missing_column_reads_as_empty(tmp_path):
+    header = "\t".join(col for col in ALDY_HEADER.split("\t") if col != "dbSNP")
+    path = tmp_path / "aldy.tsv"
+    path.write_text(header + "\nNA10860\tCYP2D6\t1\tCYP2D6*1/*4\t1;4\t0\t*4\t42522612\tC>G\t15\tS486T\tC1\tNORMAL\n")
+    calls = AldyParser().parse(str(path))
+    assert len(calls) == 1
+    variant, = calls[0]["raw_tool_output"]["variants_reported"]
+    assert variant["rsid"] is None
+    assert (variant["ref_allele"], variant["alt_allele"]) == ("C", "G")
+    assert variant["tool_specific_flags"] == "NORMAL|FUNC:S486T|CODE:C1"
+
+
+TWO_SOLUTIONS = (
+    "#Solution 1: *1.001, *4",
+    "NA10860\tCYP2D6\t1\tCYP2D6*1/*4\t1.001;4\t1\t*4\t42522612\tC>G\t15\tS486T\trs1135840\tC1\tNORMAL",
+    "NA10860\tCYP2D6\t1\tCYP2D6*1/*4\t1.001;4\t0\t*1.001\t\t\t\t\t\t\t",
+    "#Solution 2: *4, *4",
+    "NA10860\tCYP2D6\t2\tCYP2D6*4/*4\t4;4\t0\t*4\t42524946\tC>T\t32\tsplicing defect\trs3892097\tC4\tNOVEL",
+)
+
+
+def test_one_call_per_solution(tmp_path, parse):
+    calls = parse(write_aldy(tmp_path, *TWO_SOLUTIONS))
+    assert [call["raw_tool_output"]["aldy_solution_id_int"] for call in calls] == [1, 2]
+    first = calls[0]
+    assert (first["sample_id"], first["gene"], first["tool_name"]) == ("NA10860", "CYP2D6", "ALDY")
+    assert first["input_file"] == "aldy.tsv"
+    raw = first["raw_tool_output"]
+    assert raw["diplotype_string"] == "CYP2D6*1/*4"
+    assert raw["comments_raw"] == "*1.001, *4"
+    assert raw["copy_number_raw"] == 2
+    # Components come out ordered by their integer copy id, whatever the row order
+    assert [(c["allele_copy_id"], c["raw_allele_name"]) for c in raw["aldy_alleles_parsed"]] == [(0, "*1.001"), (1, "*4")]
+    # The row without a variant reports nothing
+    variant, = raw["variants_reported"]
+    assert variant["quality_score"] == 15 and isinstance(variant["quality_score"], int)
+
+
+@pytest.mark.parametrize("lines", [(), ("#Solution 1: *1, *1",)])
+def test_file_without_rows(tmp_path, parse, lines):
+    assert parse(write_aldy(tmp_path, *lines)) == []
+
+
+def test_empty_or_missing_file(tmp_path, parse):
+    empty = tmp_path / "empty.tsv"
+    empty.write_text("\n")
+    assert parse(str(empty)) == []
+    assert parse(str(tmp_path / "missing.tsv")) == []
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parse_many_matches_parse(tmp_path, workers):
+    paths = [
+        write_aldy(tmp_path, *TWO_SOLUTIONS, name="a.tsv"),
+        str(tmp_path / "missing.tsv"),
+        write_aldy(tmp_path, *(line.replace("NA10860", "HG00096") for line in TWO_SOLUTIONS), name="b.tsv"),
+    ]
+    parser = AldyParser()
+    expected = [call for path in paths for call in parser.parse(path)]
+    assert [call["sample_id"] for call in expected] == ["NA10860", "NA10860", "HG00096", "HG00096"]
+    assert parser.parse_many(paths, workers=workers) == expected
+    assert parser.parse_many([], workers=workers) == []
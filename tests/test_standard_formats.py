@@ -0,0 +1,176 @@
+import json
+
+import fastjsonschema
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from src.normalizer.gene_call_normalizer import GeneCallNormalizer
+from src.standard_formats import (
+    assert_raw_tool_output_shape, dump_gene_call_json, iter_variants_reported, pack_allele_components,
+    rows_to_columns, unpack_allele_components, validate_gene_call, validate_raw, VariantsColumnar,
+)
+
+
+def aldy_call():
+    return {
+        "sample_id": "NA10860",
+        "gene": "CYP2D6",
+        "tool_name": "ALDY",
+        "reference_genome": "GRCh37",
+        "input_file": "aldy.tsv",
+        "raw_tool_output": {
+            "diplotype_string": "CYP2D6*1/*4",
+            "copy_number_raw": 2,
+            "comments_raw": "*1.001, *4",
+            "aldy_solution_id": "1",
+            "aldy_solution_id_int": 1,
+            "aldy_alleles_in_solution_raw_string": "1.001;4",
+            "aldy_alleles_parsed": (
+                {"raw_allele_name": "*1.001", "allele_copy_id": 0},
+                {"raw_allele_name": "*4", "allele_copy_id": 1},
+            ),
+            "variants_reported": (
+                {"rsid": "rs1135840", "location": "42522612", "ref_allele": "C", "alt_allele": "G",
+                 "quality_score": 15, "allele_assignment": "*4", "tool_specific_flags": "NORMAL|FUNC:S486T|CODE:C1"},
+            ),
+        },
+    }
+
+
+@pytest.mark.parametrize("as_json", [False, True])
+def test_validate_gene_call_round_trip(as_json):
+    call = aldy_call()
+    validated = validate_gene_call(dump_gene_call_json(call) if as_json else call)
+    assert validated == call
+    assert json.loads(dump_gene_call_json(validated)) == json.loads(dump_gene_call_json(call))
+    # Numeric types survive the round trip: coverage 15 stays an int
+    assert type(validated["raw_tool_output"]["variants_reported"][0]["quality_score"]) is int
+
+
+def test_diplotype_string_is_required():
+    call = aldy_call()
+    del call["raw_tool_output"]["diplotype_string"]
+    with pytest.raises(ValueError, match="diplotype_string"):
+        assert_raw_tool_output_shape(call["raw_tool_output"])
+    with pytest.raises(ValueError, match="diplotype_string"):
+        validate_gene_call(call)
+    # JSON input and validate_raw() rely on the schema itself
+    payload = dump_gene_call_json(call)
+    with pytest.raises(ValidationError):
+        validate_gene_call(payload)
+    call["tool_name"] = "OTHER"
+    with pytest.raises(ValidationError):
+        validate_gene_call(dump_gene_call_json(call))
+    with pytest.raises(fastjsonschema.JsonSchemaValueException):
+        validate_raw(json.loads(dump_gene_call_json(call)))
+
+
+@pytest.mark.parametrize("tool_name", ["ALDY", "OTHER"])
+def test_normalization_results_survive_serialization(tool_name):
+    call = aldy_call()
+    call["tool_name"] = tool_name
+    best = GeneCallNormalizer().normalize([call])
+    dumped = json.loads(dump_gene_call_json(best))
+    assert dumped["predicted_phenotype"] == best["predicted_phenotype"]
+    assert dumped["normalized_functional_status"] == best["normalized_functional_status"]
+    assert validate_gene_call(best) == best
+    assert validate_gene_call(dump_gene_call_json(best)) == best
+    # Parser output carries neither key, and serializing it does not invent them
+    assert "predicted_phenotype" not in json.loads(dump_gene_call_json(aldy_call()))
+
+
+def test_streamed_variants_are_serialized():
+    call = aldy_call()
+    raw = call["raw_tool_output"]
+    variants = raw.pop("variants_reported")
+    raw["variants_reported_iter"] = lambda: iter(variants)
+    assert list(iter_variants_reported(raw)) == list(variants)
+    assert json.loads(dump_gene_call_json(call)) == json.loads(dump_gene_call_json(aldy_call()))
+    assert "variants_reported" not in raw
+
+
+def test_pack_allele_components_round_trip():
+    components = [
+        {"raw_allele_name": "*4", "allele_copy_id": 0},
+        {"raw_allele_name": "*1.001", "allele_copy_id": 1},
+        {"raw_allele_name": "*4", "allele_copy_id": 0xFFFFFFFE},
+        {"raw_allele_name": "*139.001", "allele_copy_id": None},
+    ]
+    packed, allele_names = pack_allele_components(components)
+    assert packed.dtype == np.int64
+    assert allele_names == ("*4", "*1.001", "*139.001")
+    assert unpack_allele_components(packed, allele_names) == components
+    assert unpack_allele_components(*pack_allele_components([])) == []
+
+
+@pytest.mark.parametrize("copy_id", [-1, 0xFFFFFFFF, 1 << 32])
+def test_pack_allele_components_rejects_unpackable_copy_ids(copy_id):
+    with pytest.raises(ValueError, match="allele_copy_id"):
+        pack_allele_components([{"raw_allele_name": "*1", "allele_copy_id": copy_id}])
+
+
+def test_rows_to_columns():
+    variants = [
+        {"rsid": "rs1135840", "ref_allele": "C", "alt_allele": "G", "quality_score": 15},
+        {"location": "42524946", "tool_specific_flags": "NOVEL"},
+    ]
+    columns = rows_to_columns(variants)
+    assert set(columns) == set(VariantsColumnar.__annotations__)
+    assert columns["rsid"] == ["rs1135840", None]
+    assert columns["location"] == [None, "42524946"]
+    assert columns["tool_specific_flags"] == [None, "NOVEL"]
+    assert columns["quality_score"].dtype == np.float64
+    assert columns["quality_score"][0] == 15 and np.isnan(columns["quality_score"][1])
+    assert len(rows_to_columns([])["quality_score"]) == 0
+
+
+def test_msgspec_mirror_round_trip():
+    msgspec = pytest.importorskip("msgspec")
+    from src.standard_formats_msgspec import (
+        decode_gene_call, encode_gene_call, gene_call_to_dict, iter_gene_calls_jsonl,
+    )
+
+    payload = dump_gene_call_json(aldy_call())
+    decoded = decode_gene_call(payload)
+    assert decoded.raw_tool_output.variants_reported[0].quality_score == 15
+    assert json.loads(encode_gene_call(decoded)) == json.loads(payload)
+    assert gene_call_to_dict(decoded) == aldy_call()
+
+    lines = [payload, b"", b"  \n", payload]
+    assert [gene_call_to_dict(call) for call in iter_gene_calls_jsonl(lines)] == [aldy_call()] * 2
+
+    call = aldy_call()
+    del call["raw_tool_output"]["diplotype_string"]
+    with pytest.raises(msgspec.ValidationError):
+        decode_gene_call(dump_gene_call_json(call))
+
+
+def test_parquet_round_trip(tmp_path):
+    import pyarrow.parquet as pq
+    from src.standard_formats_arrow import GENE_CALL_SCHEMA, gene_calls_to_table, iter_parquet, write_parquet
+
+    calls = [aldy_call() for _ in range(5)]
+    for solution_id, call in enumerate(calls, start=1):
+        call["raw_tool_output"]["aldy_solution_id_int"] = solution_id
+    streamed = calls[-1]["raw_tool_output"]
+    variants = streamed.pop("variants_reported")
+    streamed["variants_reported_iter"] = lambda: iter(variants)
+
+    path = str(tmp_path / "calls.parquet")
+    write_parquet(path, iter(calls), row_group_size=2)
+    rows = list(iter_parquet(path, batch_size=3))
+
+    assert pq.ParquetFile(path).metadata.num_row_groups == 3
+
+    assert gene_calls_to_table(calls).schema == GENE_CALL_SCHEMA
+    assert [row["raw_tool_output"]["aldy_solution_id_int"] for row in rows] == [1, 2, 3, 4, 5]
+    first = rows[0]
+    assert first["sample_id"] == "NA10860" and first["predicted_phenotype"] is None
+    raw = first["raw_tool_output"]
+    assert raw["haplotype1_raw"] is None
+    assert raw["aldy_alleles_parsed"] == [dict(component) for component in aldy_call()["raw_tool_output"]["aldy_alleles_parsed"]]
+    variant, = raw["variants_reported"]
+    assert variant["quality_score"] == 15.0 and variant["rsid"] == "rs1135840"
+    # Streamed variants are written like materialized ones
+    assert rows[-1]["raw_tool_output"]["variants_reported"] == raw["variants_reported"]